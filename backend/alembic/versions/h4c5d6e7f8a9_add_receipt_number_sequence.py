@@ -0,0 +1,37 @@
+"""Add receipt_number_seq sequence for race-free receipt numbers
+
+Revision ID: h4c5d6e7f8a9
+Revises: g3b4c5d6e7f8
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h4c5d6e7f8a9'
+down_revision: Union[str, None] = 'g3b4c5d6e7f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE receipt_number_seq START WITH 1")
+
+    # Seed the sequence so the next value follows the highest existing number
+    # ("RECIBO-00000042" -> next value 43)
+    op.execute(r"""
+        SELECT setval(
+            'receipt_number_seq',
+            COALESCE(MAX(substring(receipt_number FROM '(\d+)$')::bigint), 0) + 1,
+            false
+        )
+        FROM receipts
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE IF EXISTS receipt_number_seq")
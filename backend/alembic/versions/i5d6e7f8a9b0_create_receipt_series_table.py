@@ -0,0 +1,49 @@
+"""Create receipt_series table for independent numbering series
+
+Revision ID: i5d6e7f8a9b0
+Revises: h4c5d6e7f8a9
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i5d6e7f8a9b0'
+down_revision: Union[str, None] = 'h4c5d6e7f8a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'receipt_series',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('key', sa.String(40), nullable=False),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('prefix', sa.String(10), nullable=False),
+        sa.Column('number_digits', sa.Integer(), server_default='8', nullable=False),
+        sa.Column('sequence_name', sa.String(63), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.UniqueConstraint('prefix'),
+    )
+    op.create_index(op.f('ix_receipt_series_key'), 'receipt_series', ['key'], unique=True)
+
+
+def downgrade() -> None:
+    # Drop the per-series sequences created by the API
+    op.execute("""
+        DO $$
+        DECLARE seq text;
+        BEGIN
+            FOR seq IN SELECT sequence_name FROM receipt_series LOOP
+                EXECUTE format('DROP SEQUENCE IF EXISTS %I', seq);
+            END LOOP;
+        END $$
+    """)
+    op.drop_index(op.f('ix_receipt_series_key'), table_name='receipt_series')
+    op.drop_table('receipt_series')
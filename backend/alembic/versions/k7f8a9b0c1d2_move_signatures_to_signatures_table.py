@@ -0,0 +1,87 @@
+"""Move receipt signatures into a content-addressed signatures table
+
+Revision ID: k7f8a9b0c1d2
+Revises: j6e7f8a9b0c1
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k7f8a9b0c1d2'
+down_revision: Union[str, None] = 'j6e7f8a9b0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'signatures',
+        sa.Column('hash', sa.String(64), nullable=False),
+        sa.Column('content_type', sa.String(100), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    op.add_column('receipts', sa.Column('signature_hash', sa.String(64), nullable=True))
+
+    # Decode the stored data URLs ("data:image/png;base64,...") or bare base64,
+    # hash the bytes and store each distinct image once
+    op.execute("""
+        CREATE TEMPORARY TABLE signature_migration AS
+        SELECT id, content_type, data, encode(sha256(data), 'hex') AS hash
+        FROM (
+            SELECT
+                id,
+                CASE WHEN signature LIKE 'data:%'
+                     THEN COALESCE(substring(signature FROM '^data:([^;,]+)'), 'image/png')
+                     ELSE 'image/png' END AS content_type,
+                decode(
+                    CASE WHEN signature LIKE 'data:%'
+                         THEN substring(signature FROM ',(.*)$')
+                         ELSE signature END,
+                    'base64'
+                ) AS data
+            FROM receipts
+            WHERE signature IS NOT NULL AND signature <> ''
+        ) parsed
+    """)
+    op.execute("""
+        INSERT INTO signatures (hash, content_type, data, size_bytes)
+        SELECT DISTINCT ON (hash) hash, content_type, data, length(data)
+        FROM signature_migration
+        ORDER BY hash
+    """)
+    op.execute("""
+        UPDATE receipts r
+        SET signature_hash = m.hash
+        FROM signature_migration m
+        WHERE r.id = m.id
+    """)
+    op.execute("DROP TABLE signature_migration")
+
+    op.create_foreign_key(
+        'fk_receipts_signature_hash', 'receipts', 'signatures', ['signature_hash'], ['hash']
+    )
+    op.create_index(op.f('ix_receipts_signature_hash'), 'receipts', ['signature_hash'], unique=False)
+    op.drop_column('receipts', 'signature')
+
+
+def downgrade() -> None:
+    op.add_column('receipts', sa.Column('signature', sa.Text(), nullable=True))
+    op.execute("""
+        UPDATE receipts r
+        SET signature = 'data:' || s.content_type || ';base64,'
+                        || replace(encode(s.data, 'base64'), E'\\n', '')
+        FROM signatures s
+        WHERE r.signature_hash = s.hash
+    """)
+    op.drop_index(op.f('ix_receipts_signature_hash'), table_name='receipts')
+    op.drop_constraint('fk_receipts_signature_hash', 'receipts', type_='foreignkey')
+    op.drop_column('receipts', 'signature_hash')
+    op.drop_table('signatures')
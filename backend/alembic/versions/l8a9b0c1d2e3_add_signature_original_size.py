@@ -0,0 +1,27 @@
+"""Add original_size_bytes to signatures
+
+Revision ID: l8a9b0c1d2e3
+Revises: k7f8a9b0c1d2
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l8a9b0c1d2e3'
+down_revision: Union[str, None] = 'k7f8a9b0c1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL marks signatures stored before normalization (see backfill_signatures)
+    op.add_column('signatures', sa.Column('original_size_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('signatures', 'original_size_bytes')
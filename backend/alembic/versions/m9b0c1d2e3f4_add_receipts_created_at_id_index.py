@@ -0,0 +1,31 @@
+"""Replace created_at index with (created_at, id) for keyset pagination
+
+Revision ID: m9b0c1d2e3f4
+Revises: l8a9b0c1d2e3
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm9b0c1d2e3f4'
+down_revision: Union[str, None] = 'l8a9b0c1d2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (created_at, id) serves ORDER BY created_at DESC, id DESC with a backward
+    # index scan and the (created_at, id) < (:c, :id) keyset predicate;
+    # it also covers everything the old single-column index did
+    op.create_index('ix_receipts_created_at_id', 'receipts', ['created_at', 'id'], unique=False)
+    op.drop_index('ix_receipts_created_at', table_name='receipts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_receipts_created_at', 'receipts', ['created_at'], unique=False)
+    op.drop_index('ix_receipts_created_at_id', table_name='receipts')
@@ -0,0 +1,36 @@
+"""Add pg_trgm GIN index for receipt search
+
+Revision ID: n0c1d2e3f4a5
+Revises: m9b0c1d2e3f4
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n0c1d2e3f4a5'
+down_revision: Union[str, None] = 'm9b0c1d2e3f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Must match app.models.receipt.receipt_search_text exactly, otherwise the
+    # planner will not use the index for the search predicate
+    op.execute("""
+        CREATE INDEX ix_receipts_search_trgm ON receipts USING gin (
+            (receipt_number || ' ' || coalesce(customer_name, '') || ' ' || coalesce(customer_nit, ''))
+            gin_trgm_ops
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipts_search_trgm', table_name='receipts')
+    # The pg_trgm extension is left installed; other objects may depend on it
@@ -0,0 +1,124 @@
+"""Add Spanish full-text search vector to receipts
+
+Revision ID: o1d2e3f4a5b6
+Revises: n0c1d2e3f4a5
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'o1d2e3f4a5b6'
+down_revision: Union[str, None] = 'n0c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('receipts', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Document for one receipt: concept (A), item descriptions (B),
+    # institution (C) and notes (D)
+    op.execute("""
+        CREATE FUNCTION receipt_search_vector(
+            p_id integer, p_concept text, p_institution text, p_notes text
+        ) RETURNS tsvector
+        LANGUAGE sql STABLE AS $$
+            SELECT
+                setweight(to_tsvector('spanish', coalesce(p_concept, '')), 'A')
+                || setweight(to_tsvector('spanish', coalesce(
+                    (SELECT string_agg(description, ' ' ORDER BY line_order)
+                     FROM receipt_items WHERE receipt_id = p_id), '')), 'B')
+                || setweight(to_tsvector('spanish', coalesce(p_institution, '')), 'C')
+                || setweight(to_tsvector('spanish', coalesce(p_notes, '')), 'D')
+        $$
+    """)
+
+    # Receipt text columns changed: rebuild the row's vector in place
+    op.execute("""
+        CREATE FUNCTION receipts_search_vector_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := receipt_search_vector(NEW.id, NEW.concept, NEW.institution, NEW.notes);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER receipts_search_vector_update
+        BEFORE INSERT OR UPDATE OF concept, institution, notes ON receipts
+        FOR EACH ROW EXECUTE FUNCTION receipts_search_vector_trigger()
+    """)
+
+    # Items changed: rebuild each affected receipt once per statement, so a
+    # multi-row item insert or delete costs one update per receipt
+    op.execute("""
+        CREATE FUNCTION receipt_items_search_vector_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE receipts r
+                SET search_vector = receipt_search_vector(r.id, r.concept, r.institution, r.notes)
+                WHERE r.id IN (SELECT DISTINCT receipt_id FROM new_items);
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE receipts r
+                SET search_vector = receipt_search_vector(r.id, r.concept, r.institution, r.notes)
+                WHERE r.id IN (SELECT DISTINCT receipt_id FROM old_items);
+            ELSE
+                UPDATE receipts r
+                SET search_vector = receipt_search_vector(r.id, r.concept, r.institution, r.notes)
+                WHERE r.id IN (
+                    SELECT receipt_id FROM new_items
+                    UNION
+                    SELECT receipt_id FROM old_items
+                );
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER receipt_items_search_vector_insert
+        AFTER INSERT ON receipt_items
+        REFERENCING NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION receipt_items_search_vector_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER receipt_items_search_vector_update
+        AFTER UPDATE ON receipt_items
+        REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION receipt_items_search_vector_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER receipt_items_search_vector_delete
+        AFTER DELETE ON receipt_items
+        REFERENCING OLD TABLE AS old_items
+        FOR EACH STATEMENT EXECUTE FUNCTION receipt_items_search_vector_trigger()
+    """)
+
+    # Backfill existing receipts
+    op.execute("""
+        UPDATE receipts
+        SET search_vector = receipt_search_vector(id, concept, institution, notes)
+    """)
+
+    op.create_index(
+        'ix_receipts_search_vector', 'receipts', ['search_vector'], unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipts_search_vector', table_name='receipts')
+    op.execute("DROP TRIGGER receipt_items_search_vector_delete ON receipt_items")
+    op.execute("DROP TRIGGER receipt_items_search_vector_update ON receipt_items")
+    op.execute("DROP TRIGGER receipt_items_search_vector_insert ON receipt_items")
+    op.execute("DROP FUNCTION receipt_items_search_vector_trigger()")
+    op.execute("DROP TRIGGER receipts_search_vector_update ON receipts")
+    op.execute("DROP FUNCTION receipts_search_vector_trigger()")
+    op.execute("DROP FUNCTION receipt_search_vector(integer, text, text, text)")
+    op.drop_column('receipts', 'search_vector')
@@ -0,0 +1,59 @@
+"""Add receipts.version and jsonb_merge_patch
+
+Revision ID: p2e3f4a5b6c7
+Revises: o1d2e3f4a5b6
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'p2e3f4a5b6c7'
+down_revision: Union[str, None] = 'o1d2e3f4a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'receipts',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False)
+    )
+
+    # RFC 7396 JSON Merge Patch, so PATCH can merge custom_fields inside
+    # its UPDATE: objects merge recursively, null removes a key, anything
+    # else replaces the target
+    op.execute("""
+        CREATE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb) RETURNS jsonb
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT CASE
+                WHEN jsonb_typeof(patch) IS DISTINCT FROM 'object' THEN patch
+                ELSE (
+                    SELECT coalesce(jsonb_object_agg(key, value), '{}'::jsonb)
+                    FROM (
+                        SELECT t.key, t.value
+                        FROM jsonb_each(
+                            CASE WHEN jsonb_typeof(target) = 'object' THEN target ELSE '{}'::jsonb END
+                        ) t
+                        WHERE NOT patch ? t.key
+                        UNION ALL
+                        SELECT p.key, jsonb_merge_patch(
+                            CASE WHEN jsonb_typeof(target) = 'object' THEN target -> p.key END,
+                            p.value
+                        )
+                        FROM jsonb_each(patch) p
+                        WHERE jsonb_typeof(p.value) <> 'null'
+                    ) merged
+                )
+            END
+        $$
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION jsonb_merge_patch(jsonb, jsonb)")
+    op.drop_column('receipts', 'version')
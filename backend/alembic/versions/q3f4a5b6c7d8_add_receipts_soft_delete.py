@@ -0,0 +1,43 @@
+"""Add receipts.deleted_at for soft delete
+
+Revision ID: q3f4a5b6c7d8
+Revises: p2e3f4a5b6c7
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'q3f4a5b6c7d8'
+down_revision: Union[str, None] = 'p2e3f4a5b6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('receipts', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    # Live queries filter on deleted_at IS NULL; the list index only needs
+    # to cover those rows
+    op.drop_index('ix_receipts_created_at_id', table_name='receipts')
+    op.create_index(
+        'ix_receipts_created_at_id', 'receipts', ['created_at', 'id'], unique=False,
+        postgresql_where=sa.text('deleted_at IS NULL')
+    )
+    op.create_index(
+        'ix_receipts_deleted_at', 'receipts', ['deleted_at'], unique=False,
+        postgresql_where=sa.text('deleted_at IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    # Soft-deleted receipts would become visible again; remove them first
+    op.execute("DELETE FROM receipts WHERE deleted_at IS NOT NULL")
+    op.drop_index('ix_receipts_deleted_at', table_name='receipts')
+    op.drop_index('ix_receipts_created_at_id', table_name='receipts')
+    op.create_index('ix_receipts_created_at_id', 'receipts', ['created_at', 'id'], unique=False)
+    op.drop_column('receipts', 'deleted_at')
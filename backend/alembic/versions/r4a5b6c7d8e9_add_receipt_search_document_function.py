@@ -0,0 +1,66 @@
+"""Split the receipt search vector into a reusable document builder
+
+Revision ID: r4a5b6c7d8e9
+Revises: q3f4a5b6c7d8
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'r4a5b6c7d8e9'
+down_revision: Union[str, None] = 'q3f4a5b6c7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Weighted document from already-gathered text, so bulk loads (backup
+    # restore) can compute vectors without the per-receipt items lookup
+    op.execute("""
+        CREATE FUNCTION receipt_search_document(
+            p_concept text, p_descriptions text, p_institution text, p_notes text
+        ) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT
+                setweight(to_tsvector('spanish', coalesce(p_concept, '')), 'A')
+                || setweight(to_tsvector('spanish', coalesce(p_descriptions, '')), 'B')
+                || setweight(to_tsvector('spanish', coalesce(p_institution, '')), 'C')
+                || setweight(to_tsvector('spanish', coalesce(p_notes, '')), 'D')
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION receipt_search_vector(
+            p_id integer, p_concept text, p_institution text, p_notes text
+        ) RETURNS tsvector
+        LANGUAGE sql STABLE AS $$
+            SELECT receipt_search_document(
+                p_concept,
+                (SELECT string_agg(description, ' ' ORDER BY line_order)
+                 FROM receipt_items WHERE receipt_id = p_id),
+                p_institution,
+                p_notes
+            )
+        $$
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION receipt_search_vector(
+            p_id integer, p_concept text, p_institution text, p_notes text
+        ) RETURNS tsvector
+        LANGUAGE sql STABLE AS $$
+            SELECT
+                setweight(to_tsvector('spanish', coalesce(p_concept, '')), 'A')
+                || setweight(to_tsvector('spanish', coalesce(
+                    (SELECT string_agg(description, ' ' ORDER BY line_order)
+                     FROM receipt_items WHERE receipt_id = p_id), '')), 'B')
+                || setweight(to_tsvector('spanish', coalesce(p_institution, '')), 'C')
+                || setweight(to_tsvector('spanish', coalesce(p_notes, '')), 'D')
+        $$
+    """)
+    op.execute("DROP FUNCTION receipt_search_document(text, text, text, text)")
@@ -0,0 +1,34 @@
+"""Create backup_imports table for resumable archive imports
+
+Revision ID: s5b6c7d8e9f0
+Revises: r4a5b6c7d8e9
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 's5b6c7d8e9f0'
+down_revision: Union[str, None] = 'r4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'backup_imports',
+        sa.Column('archive_id', sa.String(64), nullable=False),
+        sa.Column('chunk_count', sa.Integer(), nullable=False),
+        sa.Column('chunks_done', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('archive_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('backup_imports')
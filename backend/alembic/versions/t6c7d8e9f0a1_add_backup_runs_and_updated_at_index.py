@@ -0,0 +1,41 @@
+"""Add backup_runs table and receipts.updated_at index for incremental backups
+
+Revision ID: t6c7d8e9f0a1
+Revises: s5b6c7d8e9f0
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 't6c7d8e9f0a1'
+down_revision: Union[str, None] = 's5b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'backup_runs',
+        sa.Column('id', sa.String(32), nullable=False),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('format', sa.String(20), nullable=False),
+        sa.Column('since', sa.DateTime(), nullable=True),
+        sa.Column('base_backup_id', sa.String(32), nullable=True),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    # Incremental exports scan receipts changed since the watermark; covers
+    # deleted receipts too, since their tombstones are part of the increment
+    op.create_index('ix_receipts_updated_at', 'receipts', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipts_updated_at', table_name='receipts')
+    op.drop_table('backup_runs')
@@ -0,0 +1,44 @@
+"""Join the receipt search fields with an unprintable separator
+
+The trigram search text joined receipt_number, customer_name and
+customer_nit with spaces, so a search term could match across two fields
+(e.g. the end of a name followed by the start of the NIT). They are now
+joined with the ASCII unit separator, which search terms never contain.
+
+Revision ID: u7d8e9f0a1b2
+Revises: t6c7d8e9f0a1
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'u7d8e9f0a1b2'
+down_revision: Union[str, None] = 't6c7d8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_search_index(separator: str) -> None:
+    # Must match app.models.receipt.receipt_search_text exactly, otherwise the
+    # planner will not use the index for the search predicate
+    op.execute(f"""
+        CREATE INDEX ix_receipts_search_trgm ON receipts USING gin (
+            (receipt_number || {separator} || coalesce(customer_name, '') || {separator} || coalesce(customer_nit, ''))
+            gin_trgm_ops
+        )
+    """)
+
+
+def upgrade() -> None:
+    op.drop_index('ix_receipts_search_trgm', table_name='receipts')
+    _create_search_index(r"E'\x1f'")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipts_search_trgm', table_name='receipts')
+    _create_search_index("' '")
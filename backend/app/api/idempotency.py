@@ -0,0 +1,63 @@
+"""Idempotency-Key handling shared by the API endpoints."""
+from typing import Any, Awaitable, Callable
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session_maker, engine
+from app.services import idempotency_service
+
+
+async def idempotent_response(
+    key: str,
+    scope: str,
+    payload: Any,
+    handler: Callable[[AsyncSession], Awaitable[BaseModel]],
+    status_code: int = status.HTTP_200_OK,
+) -> JSONResponse:
+    """
+    Run handler at most once per (key, scope).
+
+    The first request claims the key, runs the handler and stores its
+    response, all in one database transaction: the handler gets a session
+    joined to it whose commits only release savepoints. The write and the
+    stored response therefore commit together, and a request that fails or
+    crashes leaves no trace of the key, so its retry simply runs again.
+    A retry with the same key and payload gets the stored response back
+    without running the handler (a retry sent while the first request is
+    still running waits for it). Reusing a key with a different payload is
+    rejected.
+    """
+    request_hash = idempotency_service.fingerprint(payload)
+    async with engine.connect() as connection:
+        await connection.begin()
+        async with async_session_maker(bind=connection, join_transaction_mode="create_savepoint") as session:
+            try:
+                existing = await idempotency_service.reserve_key(session, key, scope, request_hash)
+            except idempotency_service.IdempotencyKeyBusy:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was already used with a different request payload"
+                    )
+                return JSONResponse(
+                    content=existing.response_body,
+                    status_code=existing.status_code,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            # On an exception the connection closes without committing, which
+            # rolls back the claim together with the handler's writes
+            result = await handler(session)
+            body = result.model_dump(mode="json")
+            await idempotency_service.complete_key(session, key, scope, status_code, body)
+            await session.commit()
+        await connection.commit()
+    return JSONResponse(content=body, status_code=status_code)
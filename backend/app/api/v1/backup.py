@@ -1,38 +1,101 @@
 """Backup and restore API endpoints."""
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import JSONResponse
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-import json
 
 from app.core.database import get_db
 from app.core.deps import get_current_user_required
 from app.models.user import User
-from app.services.backup_service import export_all_receipts, import_receipts
+from app.services.backup_format import READ_CHUNK_SIZE, BackupArchive, BackupReader, open_archive
+from app.services.backup_service import (
+    BACKUP_FORMATS,
+    RestoreTargetNotEmpty,
+    begin_backup_run,
+    import_archive,
+    import_receipts,
+    restore_receipts,
+    stream_backup,
+    stream_backup_archive,
+)
 
 
 router = APIRouter(prefix="/backup", tags=["backup"])
 
+BACKUP_EXTENSIONS = (".json", ".ndjson", ".jsonl", ".tar")
+
 
 @router.get("/export")
 async def export_backup(
     current_user: Annotated[User, Depends(get_current_user_required)],
-    session: Annotated[AsyncSession, Depends(get_db)]
+    session: Annotated[AsyncSession, Depends(get_db)],
+    format: Literal["json", "ndjson", "archive"] = Query("json", description="json, ndjson or archive"),
+    since: Optional[str] = Query(
+        None, description="Incremental backup: an ISO timestamp or the id of an earlier backup"
+    )
 ):
     """
-    Export all receipts to JSON format.
-    Returns a backup file that can be downloaded.
+    Export all receipts as a downloadable backup file.
+
+    - **format**: json (a single backup object, the default), ndjson
+      (a header line followed by one receipt per line) or archive (a .tar
+      of gzip-compressed NDJSON chunks plus a manifest with per-chunk
+      counts and SHA-256 checksums; much smaller, and its import can resume)
+    - **since**: only receipts created or changed after this point, plus a
+      tombstone ({"receipt_number", "deleted_at"}) for each receipt deleted
+      since then. Pass the id of the previous backup (X-Backup-Id header,
+      backup_id in the file) to chain incrementals without gaps.
+
+    Every backup has an id (X-Backup-Id) and a watermark in its header:
+    changes committed before the watermark are in it. The file is streamed
+    from a server-side cursor as it is read, so memory use does not grow
+    with the number of receipts.
     """
-    backup_data = await export_all_receipts(session)
+    try:
+        run = await begin_backup_run(session, format, since)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parámetro since inválido: {str(e)}"
+        )
 
-    # Return as JSON with proper filename header
-    response = JSONResponse(
-        content=backup_data,
+    extension = "tar" if format == "archive" else format
+    kind = "incremental_" if run.kind == "incremental" else ""
+    filename = f"receipts_backup_{kind}{datetime.utcnow().date().isoformat()}.{extension}"
+    return StreamingResponse(
+        stream_backup_archive(run) if format == "archive" else stream_backup(run),
+        media_type=BACKUP_FORMATS[format],
         headers={
-            "Content-Disposition": f"attachment; filename=receipts_backup_{backup_data['created_at'][:10]}.json"
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Backup-Id": run.id,
         }
     )
-    return response
+
+
+async def _upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an upload in fixed-size pieces instead of all at once"""
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        yield chunk
+
+
+def _check_backup_file(file: UploadFile) -> None:
+    if not file.filename or not file.filename.endswith(BACKUP_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe ser un respaldo JSON (.json), NDJSON (.ndjson) o archivo (.tar)"
+        )
+
+
+async def _open_archive(file: UploadFile) -> BackupArchive:
+    """Open an uploaded .tar archive (the upload is already spooled to a seekable file)"""
+    try:
+        return await open_archive(file.file)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo de respaldo inválido: {str(e)}"
+        )
 
 
 @router.post("/import")
@@ -43,50 +106,115 @@ async def import_backup(
     skip_existing: bool = True
 ):
     """
-    Import receipts from a backup JSON file.
+    Import receipts from a backup file.
 
     Args:
-        file: JSON backup file
-        skip_existing: If True (default), skip receipts that already exist
+        file: JSON backup file, NDJSON (.ndjson) or archive (.tar) as
+            written by the export
+        skip_existing: If True (default), skip receipts that already exist;
+            if False, replace them. Apply incremental backups with False, in
+            order; their tombstones soft-delete receipts (deleted)
+
+    The file is parsed as it is read and imported in committed chunks, so
+    memory use does not depend on its size. If the file turns out to be
+    malformed part way through, the receipts before the error stay imported
+    and the error is listed in errors.
+
+    Archives are verified chunk by chunk (SHA-256). Uploading an archive
+    whose import was interrupted resumes after the last committed chunk;
+    resumed_from_chunk says how many chunks were already imported.
 
     Returns:
         Import statistics
     """
-    # Validate file type
-    if not file.filename or not file.filename.endswith('.json'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo debe ser un archivo JSON (.json)"
-        )
+    _check_backup_file(file)
+
+    if file.filename.endswith(".tar"):
+        archive = await _open_archive(file)
+        try:
+            result = await import_archive(session, archive, skip_existing)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Archivo de respaldo inválido: {str(e)}"
+            )
+    else:
+        reader = BackupReader(_upload_chunks(file))
+        try:
+            result = await import_receipts(session, reader.receipts(), skip_existing)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Error al parsear el archivo JSON: {str(e)}"
+            )
+
+        # Validate backup structure
+        if not reader.found_receipts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El archivo no contiene datos de recibos válidos"
+            )
+
+    response = {
+        "message": "Importación completada",
+        "imported": result["imported"],
+        "skipped": result["skipped"],
+        "deleted": result["deleted"],
+        "errors": result["errors"],
+        "total_processed": result["total_processed"],
+    }
+    if "resumed_from_chunk" in result:
+        response["resumed_from_chunk"] = result["resumed_from_chunk"]
+    return response
 
-    # Read and parse file
+
+@router.post("/restore")
+async def restore_backup(
+    current_user: Annotated[User, Depends(get_current_user_required)],
+    session: Annotated[AsyncSession, Depends(get_db)],
+    file: UploadFile = File(...)
+):
+    """
+    Restore a backup file into an empty database (disaster recovery).
+
+    Much faster than /import: rows are bulk-loaded with COPY in a single
+    transaction, so either the whole file is restored or nothing is: a
+    receipt that cannot be read fails the restore with 400, listing the
+    bad receipts.
+    Only allowed while there are no receipts at all (not even deleted ones);
+    use /import to merge a backup into existing data.
+
+    Args:
+        file: JSON, NDJSON or archive (.tar) backup file
+
+    Returns:
+        Restore statistics
+    """
+    _check_backup_file(file)
+
+    reader = await _open_archive(file) if file.filename.endswith(".tar") else BackupReader(_upload_chunks(file))
     try:
-        content = await file.read()
-        backup_data = json.loads(content.decode('utf-8'))
-    except json.JSONDecodeError as e:
+        result = await restore_receipts(session, reader.receipts())
+    except RestoreTargetNotEmpty:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Error al parsear el archivo JSON: {str(e)}"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La restauración solo se permite en una base de datos sin recibos; use la importación"
         )
-    except Exception as e:
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Error al leer el archivo: {str(e)}"
+            detail=f"Error al restaurar el respaldo: {str(e)}"
         )
 
-    # Validate backup structure
-    if "receipts" not in backup_data:
+    if isinstance(reader, BackupReader) and not reader.found_receipts:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El archivo no contiene datos de recibos válidos"
         )
 
-    # Import receipts
-    result = await import_receipts(session, backup_data, skip_existing)
-
     return {
-        "message": "Importación completada",
-        "imported": result["imported"],
+        "message": "Restauración completada",
+        "restored": result["restored"],
         "skipped": result["skipped"],
         "errors": result["errors"],
         "total_processed": result["total_processed"],
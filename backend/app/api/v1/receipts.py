@@ -1,32 +1,57 @@
-from datetime import date
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.idempotency import idempotent_response
 from app.core.database import get_db
+from app.core.http_cache import etag_matches, is_not_modified, not_modified, parse_if_match, validator_headers
 from app.schemas.receipt import (
     ReceiptCreate,
     ReceiptUpdate,
+    ReceiptPatch,
     ReceiptResponse,
     ReceiptListResponse,
+    ReceiptSearchResult,
+    ReceiptFacetsResponse,
     ReceiptStatus,
+    ReceiptBatchResult,
+    ReceiptBatchResponse,
+    ReceiptStatusChange,
+    ReceiptStatusChangeResponse,
 )
-from app.services import receipt_service
+from app.services import export_service, receipt_cache, receipt_service, signature_service
 
 router = APIRouter(prefix="/receipts", tags=["receipts"])
 
+# Maximum number of receipts accepted by POST /receipts/batch
+MAX_BATCH_SIZE = 1000
+
 
 @router.get("/next-number")
 async def get_next_receipt_number(
+    series: Optional[str] = Query(None, description="Numbering series key (default series if omitted)"),
     session: AsyncSession = Depends(get_db)
 ):
     """
     Get the next receipt number that will be assigned.
     Useful for preview purposes before saving a receipt.
+    Does not reserve the number; a concurrent create may still take it.
+
+    - **series**: Numbering series key (optional)
     """
     try:
-        next_number = await receipt_service.generate_receipt_number(session)
+        next_number = await receipt_service.peek_next_receipt_number(session, series)
         return {"next_number": next_number}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -37,6 +62,7 @@ async def get_next_receipt_number(
 @router.post("", response_model=ReceiptResponse, status_code=status.HTTP_201_CREATED)
 async def create_receipt(
     receipt_data: ReceiptCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     session: AsyncSession = Depends(get_db)
 ):
     """
@@ -49,26 +75,146 @@ async def create_receipt(
     - **date**: Receipt date (optional, defaults to current date)
     - **notes**: Additional notes (optional)
     - **signature**: Base64 encoded signature image (optional)
+    - **series**: Numbering series key (optional, default series if omitted)
     - **items**: List of receipt items (minimum 1 required)
+
+    Send an **Idempotency-Key** header to make retries safe: a repeated
+    request with the same key returns the original response.
+    """
+    async def handler(session: AsyncSession) -> ReceiptResponse:
+        try:
+            receipt = await receipt_service.create_receipt(session, receipt_data)
+            return ReceiptResponse.model_validate(receipt)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error creating receipt: {str(e)}"
+            )
+
+    if idempotency_key is None:
+        return await handler(session)
+    return await idempotent_response(
+        idempotency_key,
+        "POST /receipts",
+        receipt_data.model_dump(mode="json"),
+        handler,
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.post("/batch", response_model=ReceiptBatchResponse)
+async def create_receipts_batch(
+    entries: List[Dict[str, Any]] = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Create many receipts at once (e.g. end-of-day load from offline desks).
+
+    Accepts a list of receipt payloads with the same shape as POST /receipts.
+    Numbers are reserved in one step per series and all valid entries are
+    written in a single transaction. Each entry reports success or failure;
+    invalid entries do not prevent the valid ones from being created.
+    Supports the **Idempotency-Key** header like POST /receipts.
+    """
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch exceeds the maximum of {MAX_BATCH_SIZE} receipts"
+        )
+
+    async def handler(session: AsyncSession) -> ReceiptBatchResponse:
+        # Validate entries individually so one bad payload only fails itself
+        results: List[Optional[ReceiptBatchResult]] = [None] * len(entries)
+        valid_indexes = []
+        valid_data = []
+        for idx, entry in enumerate(entries):
+            try:
+                valid_data.append(ReceiptCreate.model_validate(entry))
+                valid_indexes.append(idx)
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                    for err in e.errors()
+                )
+                results[idx] = ReceiptBatchResult(index=idx, success=False, error=error)
+
+        try:
+            created = await receipt_service.create_receipts_batch(session, valid_data)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error creating receipts: {str(e)}"
+            )
+
+        for idx, outcome in zip(valid_indexes, created):
+            results[idx] = ReceiptBatchResult(
+                index=idx,
+                success=outcome["error"] is None,
+                **outcome,
+            )
+
+        created_count = sum(1 for result in results if result.success)
+        return ReceiptBatchResponse(
+            created=created_count,
+            failed=len(results) - created_count,
+            results=results,
+        )
+
+    if idempotency_key is None:
+        return await handler(session)
+    return await idempotent_response(
+        idempotency_key, "POST /receipts/batch", entries, handler
+    )
+
+
+@router.post("/status", response_model=ReceiptStatusChangeResponse)
+async def change_receipts_status(
+    change: ReceiptStatusChange,
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Change the status of many receipts at once.
+
+    - **status**: Target status
+    - **ids**, **receipt_numbers** or **filter**: Exactly one, selecting the
+      receipts (filter takes search, date_from, date_to and status like the list)
+
+    Only allowed transitions are applied (draft -> completed/paid/cancelled,
+    completed -> paid/cancelled, paid -> cancelled); other receipts are left
+    as they are. The response lists the ids that changed and, for ids and
+    receipt_numbers, why the others did not.
     """
     try:
-        receipt = await receipt_service.create_receipt(session, receipt_data)
-        return receipt
+        return await receipt_service.change_receipts_status(
+            session,
+            change.status,
+            ids=change.ids,
+            receipt_numbers=change.receipt_numbers,
+            filters=change.filter.model_dump() if change.filter else None,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating receipt: {str(e)}"
+            detail=f"Error changing receipt status: {str(e)}"
         )
 
 
 @router.get("", response_model=List[ReceiptListResponse])
 async def list_receipts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     date_from: Optional[date] = Query(None, description="Filter receipts from this date"),
     date_to: Optional[date] = Query(None, description="Filter receipts up to this date"),
     receipt_status: Optional[ReceiptStatus] = Query(None, alias="status", description="Filter by status"),
+    cursor: Optional[str] = Query(None, description="Continue after this position (X-Next-Cursor of the previous page)"),
     session: AsyncSession = Depends(get_db)
 ):
     """
@@ -80,42 +226,261 @@ async def list_receipts(
     - **date_from**: Filter receipts from this date (optional)
     - **date_to**: Filter receipts up to this date (optional)
     - **status**: Filter by status (draft, completed, paid, cancelled) (optional)
+    - **cursor**: Opaque cursor for keyset pagination (optional)
+
+    When a full page is returned, the **X-Next-Cursor** response header holds
+    the cursor for the next page. Cursor pages stay fast at any depth and do
+    not shift when new receipts are created.
     """
     try:
         receipts = await receipt_service.list_receipts(
-            session, skip, limit, search, date_from, date_to, receipt_status
+            session, skip, limit, search, date_from, date_to, receipt_status, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        return receipts
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error listing receipts: {str(e)}"
         )
 
+    if receipts and len(receipts) == limit:
+        last = receipts[-1]
+        response.headers["X-Next-Cursor"] = receipt_service.encode_cursor(last.created_at, last.id)
+    return receipts
+
+
+@router.get("/cache/stats")
+async def receipt_cache_stats():
+    """
+    Hit and miss counters of the receipt detail cache.
+
+    Counters are per worker process; **entries** and **bytes** are only
+    reported by the in-memory backend.
+    """
+    return receipt_cache.receipt_cache.stats()
+
+
+@router.get("/export")
+async def export_receipts(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson or csv"),
+    include_items: bool = Query(False, description="Include line items"),
+    search: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Filter receipts from this date"),
+    date_to: Optional[date] = Query(None, description="Filter receipts up to this date"),
+    receipt_status: Optional[ReceiptStatus] = Query(None, alias="status", description="Filter by status"),
+):
+    """
+    Stream every receipt matching the list filters, newest first.
+
+    - **format**: ndjson (one receipt per line) or csv
+    - **include_items**: Add line items (an items array in NDJSON, item rows in CSV)
+    - **search**, **date_from**, **date_to**, **status**: Same as the list endpoint
+
+    There is no limit; rows are read through a server-side cursor and
+    written as they arrive, so exports of any size use constant memory.
+    """
+    filename = f"receipts_{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        export_service.stream_receipts(
+            format, include_items, search, date_from, date_to, receipt_status
+        ),
+        media_type=export_service.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@router.get("/facets", response_model=ReceiptFacetsResponse)
+async def receipt_facets(
+    search: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Filter receipts from this date"),
+    date_to: Optional[date] = Query(None, description="Filter receipts up to this date"),
+    receipt_status: Optional[ReceiptStatus] = Query(None, alias="status", description="Filter by status"),
+    exact: bool = Query(False, description="Always count rows, never use estimates"),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Count receipts matching the list filters, with breakdowns by status and payment method.
+
+    Takes the same filters as the list endpoint (**search**, **date_from**,
+    **date_to**, **status**). Results are cached for a few seconds.
+    Without filters, large tables report planner estimates
+    (**estimated**: true) unless **exact** is set.
+    """
+    try:
+        return await receipt_service.count_receipt_facets(
+            session, search, date_from, date_to, receipt_status, exact
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error counting receipts: {str(e)}"
+        )
+
+
+@router.get("/search", response_model=List[ReceiptSearchResult])
+async def search_receipts(
+    q: str = Query(..., min_length=1, description="Words to search for (prefixes match)"),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search by what was paid for, best matches first.
+
+    - **q**: Words to search in concept, item descriptions, institution and notes
+    - **skip**: Number of results to skip (default: 0)
+    - **limit**: Maximum number of results to return (default: 20, max: 100)
+
+    Matching uses Spanish stemming, and every word also matches as a prefix.
+    Each result has a **rank** and a **snippet** with the matched terms
+    wrapped in <b></b> (the text is not HTML-escaped).
+    """
+    try:
+        return await receipt_service.search_receipts(session, q, skip, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching receipts: {str(e)}"
+        )
+
+
+def _receipt_validators(receipt_id: int, version: int, updated_at: datetime, include_signature: bool) -> dict:
+    """
+    Validator headers for a receipt representation. The ETag is strong
+    ("<id>-<version>", plus "-nosig" without the signature) so it can be
+    used with If-Match.
+    """
+    etag = f'"{receipt_id}-{version}"' if include_signature else f'"{receipt_id}-{version}-nosig"'
+    return {**validator_headers(etag, updated_at), "ETag": etag}
+
+
+def _if_match_versions(if_match: str, receipt_id: int) -> Optional[List[int]]:
+    """Receipt versions named by an If-Match header (None for "*")"""
+    tags = parse_if_match(if_match)
+    if tags is None:
+        return None
+    versions = []
+    for tag in tags:
+        parts = tag.split("-")
+        if len(parts) in (2, 3) and parts[0] == str(receipt_id) and parts[1].isdigit():
+            versions.append(int(parts[1]))
+    return versions
+
+
+async def _receipt_response(session: AsyncSession, receipt_id: int, current: Row, include_signature: bool) -> Response:
+    """
+    Receipt JSON with validators, from the cache or loaded and then cached.
+    current is the receipt's (version, updated_at) as read from the database;
+    only a cache entry of that version is served.
+    """
+    version, updated_at = current.version, current.updated_at
+    body = await receipt_cache.get_cached_receipt(receipt_id, include_signature, version)
+    if body is None:
+        receipt = await receipt_service.get_receipt(session, receipt_id, include_signature)
+        if not receipt:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Receipt with ID {receipt_id} not found"
+            )
+        # Changed since current was read: send (and cache) the newer copy
+        version, updated_at = receipt.version, receipt.updated_at
+        body = await receipt_cache.cache_receipt(receipt, include_signature, current.version)
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=_receipt_validators(receipt_id, version, updated_at, include_signature),
+    )
+
 
 @router.get("/{receipt_id}", response_model=ReceiptResponse)
 async def get_receipt(
     receipt_id: int,
+    request: Request,
+    include_signature: bool = Query(True, description="Inline the signature image as a data URL"),
     session: AsyncSession = Depends(get_db)
 ):
     """
     Get a single receipt by ID with all items.
 
     - **receipt_id**: Receipt ID
+    - **include_signature**: Set to false to leave out the signature image
+      (fetch it separately from /receipts/{id}/signature)
+
+    Responses carry ETag and Last-Modified; If-None-Match / If-Modified-Since
+    requests for an unchanged receipt get 304 Not Modified.
     """
-    receipt = await receipt_service.get_receipt(session, receipt_id)
-    if not receipt:
+    # The version lookup answers revalidation and keys the cached body, so
+    # neither needs the receipt and its items
+    current = await receipt_service.get_receipt_version(session, receipt_id)
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Receipt with ID {receipt_id} not found"
         )
-    return receipt
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        headers = _receipt_validators(receipt_id, current.version, current.updated_at, include_signature)
+        if is_not_modified(request, headers["ETag"], current.updated_at):
+            return not_modified(headers)
+
+    return await _receipt_response(session, receipt_id, current, include_signature)
+
+
+@router.get("/{receipt_id}/signature")
+async def get_receipt_signature(
+    receipt_id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Get the signature image of a receipt as binary image data.
+
+    The ETag is the SHA-256 of the image, so clients can revalidate with
+    If-None-Match and get 304 Not Modified without downloading it again.
+
+    - **receipt_id**: Receipt ID
+    """
+    info = await receipt_service.get_receipt_signature_info(session, receipt_id)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Receipt with ID {receipt_id} not found"
+        )
+    signature_hash, content_type = info
+    if signature_hash is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Receipt with ID {receipt_id} has no signature"
+        )
+
+    headers = {
+        "ETag": f'"{signature_hash}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Serve from the on-disk cache when configured, without reading the blob
+    path = signature_service.signature_file_path(signature_hash)
+    if path is not None and path.exists():
+        return FileResponse(path, media_type=content_type, headers=headers)
+
+    signature = await signature_service.get_signature(session, signature_hash)
+    if path is not None:
+        await run_in_threadpool(signature_service.write_signature_file, path, signature.data)
+    return Response(content=signature.data, media_type=content_type, headers=headers)
 
 
 @router.put("/{receipt_id}", response_model=ReceiptResponse)
 async def update_receipt(
     receipt_id: int,
     receipt_data: ReceiptUpdate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    if_match: Optional[str] = Header(None, alias="If-Match"),
     session: AsyncSession = Depends(get_db)
 ):
     """
@@ -123,23 +488,108 @@ async def update_receipt(
 
     - **receipt_id**: Receipt ID
     - All fields are optional, only provided fields will be updated
+    - Supports the **Idempotency-Key** header like POST /receipts
+    - Optional **If-Match** (receipt ETag): 412 if the receipt changed since
     """
-    try:
-        receipt = await receipt_service.update_receipt(session, receipt_id, receipt_data)
-        if not receipt:
+    versions = _if_match_versions(if_match, receipt_id) if if_match is not None else None
+
+    async def handler(session: AsyncSession) -> ReceiptResponse:
+        try:
+            receipt = await receipt_service.update_receipt(session, receipt_id, receipt_data, versions)
+            if not receipt:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Receipt with ID {receipt_id} not found"
+                )
+            return ReceiptResponse.model_validate(receipt)
+        except HTTPException:
+            raise
+        except receipt_service.ReceiptVersionConflict:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Receipt with ID {receipt_id} not found"
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="If-Match does not match the current receipt version"
             )
-        return receipt
-    except HTTPException:
-        raise
-    except Exception as e:
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error updating receipt: {str(e)}"
+            )
+
+    if idempotency_key is None:
+        return await handler(session)
+    return await idempotent_response(
+        idempotency_key,
+        f"PUT /receipts/{receipt_id}",
+        receipt_data.model_dump(mode="json"),
+        handler,
+    )
+
+
+@router.patch("/{receipt_id}", response_model=ReceiptResponse)
+async def patch_receipt(
+    receipt_id: int,
+    patch: Dict[str, Any] = Body(..., media_type="application/merge-patch+json"),
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Partially update a receipt with a JSON Merge Patch (RFC 7396).
+
+    - **receipt_id**: Receipt ID
+    - **If-Match**: Required. The ETag from GET /receipts/{id}; the patch is
+      only applied if the receipt has not changed since (412 otherwise)
+    - Keys present in the body are set, null clears a field, and
+      custom_fields is merged recursively. Items cannot be patched (use PUT).
+
+    Returns the updated receipt with its new ETag.
+    """
+    if if_match is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error updating receipt: {str(e)}"
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="If-Match header is required"
+        )
+    try:
+        changes = ReceiptPatch.model_validate(patch)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False)
+        )
+
+    versions = _if_match_versions(if_match, receipt_id)
+    if versions == []:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not match the current receipt version"
+        )
+
+    try:
+        result = await receipt_service.patch_receipt(
+            session, receipt_id, changes.model_dump(exclude_unset=True), versions
+        )
+    except receipt_service.ReceiptVersionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not match the current receipt version"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Receipt with ID {receipt_id} not found"
         )
 
+    return await _receipt_response(session, receipt_id, result, include_signature=True)
+
 
 @router.delete("/{receipt_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_receipt(
@@ -147,7 +597,11 @@ async def delete_receipt(
     session: AsyncSession = Depends(get_db)
 ):
     """
-    Delete a receipt (cascade deletes all items).
+    Delete a receipt.
+
+    The receipt is soft-deleted: it disappears from all endpoints but can be
+    brought back with POST /receipts/{id}/restore until it is purged
+    (after RECEIPT_RETENTION_DAYS).
 
     - **receipt_id**: Receipt ID
     """
@@ -166,3 +620,28 @@ async def delete_receipt(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting receipt: {str(e)}"
         )
+
+
+@router.post("/{receipt_id}/restore", response_model=ReceiptResponse)
+async def restore_receipt(
+    receipt_id: int,
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Restore a deleted receipt that has not been purged yet.
+
+    - **receipt_id**: Receipt ID
+    """
+    try:
+        receipt = await receipt_service.restore_receipt(session, receipt_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error restoring receipt: {str(e)}"
+        )
+    if not receipt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Deleted receipt with ID {receipt_id} not found"
+        )
+    return receipt
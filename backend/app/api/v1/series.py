@@ -0,0 +1,44 @@
+"""Receipt numbering series API endpoints."""
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.deps import get_current_user_required
+from app.models.series import ReceiptSeries
+from app.models.user import User
+from app.schemas.series import SeriesCreate, SeriesResponse
+from app.services import series_service
+
+
+router = APIRouter(prefix="/receipt-series", tags=["receipt-series"])
+
+
+@router.get("", response_model=List[SeriesResponse])
+async def list_series(
+    current_user: Annotated[User, Depends(get_current_user_required)],
+    session: Annotated[AsyncSession, Depends(get_db)]
+):
+    """List all numbering series."""
+    return await series_service.list_series(session)
+
+
+@router.post("", response_model=SeriesResponse, status_code=status.HTTP_201_CREATED)
+async def create_series(
+    series_data: SeriesCreate,
+    current_user: Annotated[User, Depends(get_current_user_required)],
+    session: Annotated[AsyncSession, Depends(get_db)]
+):
+    """Create a numbering series with its own prefix, padding and counter."""
+    stmt = select(ReceiptSeries.id).where(
+        (ReceiptSeries.key == series_data.key) | (ReceiptSeries.prefix == series_data.prefix)
+    )
+    existing = await session.execute(stmt)
+    if existing.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe una serie con esa clave o prefijo"
+        )
+
+    return await series_service.create_series(session, series_data)
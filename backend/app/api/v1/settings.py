@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.database import get_db
 from app.core.deps import get_current_user_required
+from app.core.http_cache import is_not_modified, not_modified, validator_headers, version_etag
 from app.models.settings import Settings
 from app.models.user import User
 from app.schemas.settings import SettingsResponse, SettingsUpdate
@@ -13,10 +14,23 @@ router = APIRouter(prefix="/settings", tags=["settings"])
 
 @router.get("", response_model=SettingsResponse)
 async def get_settings(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_required)
 ):
-    """Get application settings (requires authentication)"""
+    """
+    Get application settings (requires authentication)
+    Supports If-None-Match / If-Modified-Since (304 when unchanged)
+    """
+    # Revalidation only needs updated_at
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        updated_at = await db.scalar(select(Settings.updated_at).where(Settings.id == 1))
+        if updated_at is not None:
+            headers = validator_headers(version_etag("settings", updated_at), updated_at, private=True)
+            if is_not_modified(request, headers["ETag"], updated_at):
+                return not_modified(headers)
+
     # Get settings (always ID 1 for system-wide settings)
     result = await db.execute(select(Settings).where(Settings.id == 1))
     settings = result.scalar_one_or_none()
@@ -41,6 +55,9 @@ async def get_settings(
             }
         )
 
+    response.headers.update(
+        validator_headers(version_etag("settings", settings.updated_at), settings.updated_at, private=True)
+    )
     return settings
 
 
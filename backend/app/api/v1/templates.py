@@ -1,11 +1,12 @@
 """Receipt template API endpoints."""
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.deps import get_current_user_required
+from app.core.http_cache import is_not_modified, not_modified, validator_headers, version_etag
 from app.models.user import User
 from app.models.template import ReceiptTemplate
 from app.schemas.template import (
@@ -21,10 +22,27 @@ router = APIRouter(prefix="/templates", tags=["templates"])
 
 @router.get("", response_model=List[TemplateListResponse])
 async def list_templates(
+    request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user_required)],
     session: Annotated[AsyncSession, Depends(get_db)]
 ):
-    """List all templates for the current user."""
+    """List all templates for the current user (304 when unchanged)."""
+    # Version of the whole list: any create, update or delete changes the
+    # count or the latest updated_at
+    version = await session.execute(
+        select(func.count(), func.max(ReceiptTemplate.updated_at))
+        .where(ReceiptTemplate.user_id == current_user.id)
+    )
+    count, updated_at = version.one()
+    headers = None
+    if updated_at is not None:
+        headers = validator_headers(
+            version_etag(f"templates-{current_user.id}-{count}", updated_at), updated_at, private=True
+        )
+        if is_not_modified(request, headers["ETag"], updated_at):
+            return not_modified(headers)
+
     stmt = (
         select(ReceiptTemplate)
         .where(ReceiptTemplate.user_id == current_user.id)
@@ -32,6 +50,8 @@ async def list_templates(
     )
     result = await session.execute(stmt)
     templates = list(result.scalars().all())
+    if headers:
+        response.headers.update(headers)
     return templates
 
 
@@ -67,10 +87,25 @@ async def create_template(
 @router.get("/{template_id}", response_model=TemplateResponse)
 async def get_template(
     template_id: int,
+    request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user_required)],
     session: Annotated[AsyncSession, Depends(get_db)]
 ):
-    """Get a template by ID."""
+    """Get a template by ID (304 when unchanged)."""
+    # Revalidation only needs updated_at
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        updated_at = await session.scalar(
+            select(ReceiptTemplate.updated_at).where(
+                ReceiptTemplate.id == template_id,
+                ReceiptTemplate.user_id == current_user.id
+            )
+        )
+        if updated_at is not None:
+            headers = validator_headers(version_etag(f"template-{template_id}", updated_at), updated_at, private=True)
+            if is_not_modified(request, headers["ETag"], updated_at):
+                return not_modified(headers)
+
     stmt = select(ReceiptTemplate).where(
         ReceiptTemplate.id == template_id,
         ReceiptTemplate.user_id == current_user.id
@@ -84,6 +119,9 @@ async def get_template(
             detail="Plantilla no encontrada"
         )
 
+    response.headers.update(
+        validator_headers(version_etag(f"template-{template.id}", template.updated_at), template.updated_at, private=True)
+    )
     return template
 
 
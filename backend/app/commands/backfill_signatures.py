@@ -0,0 +1,114 @@
+"""
+Reprocess stored signatures through the normalization pipeline.
+
+Signatures stored before normalization existed (original_size_bytes IS NULL)
+are cropped, downscaled and re-encoded in batches; receipts are repointed to
+the new hash (bumping their version and updated_at, so ETags, cached
+responses and incremental backups see the new image) and the old image is
+removed, from the table and the on-disk cache, unless a receipt written
+meanwhile still points at it. Each batch is committed on its own,
+so the command can be interrupted and run again.
+
+Usage:
+    python -m app.commands.backfill_signatures [--batch-size 100]
+"""
+import argparse
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+
+from app.core.database import async_session_maker
+from app.core.process_pool import shutdown_process_pool
+from app.models.receipt import Receipt
+from app.models.signature import Signature
+from app.services.receipt_cache import invalidate_receipts
+from app.services.signature_service import (
+    delete_orphaned_signatures,
+    normalize_signature,
+    remove_signature_files,
+    save_signatures,
+)
+
+
+async def backfill_signatures(batch_size: int) -> None:
+    processed = 0
+    failed = 0
+    bytes_before = 0
+    bytes_after = 0
+    last_hash = ""
+
+    async with async_session_maker() as session:
+        while True:
+            stmt = (
+                select(Signature)
+                .where(Signature.original_size_bytes.is_(None), Signature.hash > last_hash)
+                .order_by(Signature.hash)
+                .limit(batch_size)
+            )
+            batch = list((await session.scalars(stmt)).all())
+            if not batch:
+                break
+            last_hash = batch[-1].hash
+            repointed_ids = []
+            replaced_hashes = []
+
+            outcomes = await asyncio.gather(
+                *(normalize_signature(old.content_type, old.data) for old in batch),
+                return_exceptions=True,
+            )
+
+            for old, new in zip(batch, outcomes):
+                if isinstance(new, Exception):
+                    failed += 1
+                    print(f"  {old.hash[:12]}: skipped ({new})")
+                    continue
+
+                processed += 1
+                bytes_before += old.size_bytes
+                bytes_after += new.size_bytes
+
+                if new.hash == old.hash:
+                    # Already as small as it gets; just mark it as processed
+                    old.original_size_bytes = old.size_bytes
+                    continue
+
+                await save_signatures(session, [new])
+                result = await session.execute(
+                    update(Receipt)
+                    .where(Receipt.signature_hash == old.hash)
+                    .values(signature_hash=new.hash, version=Receipt.version + 1, updated_at=func.now())
+                    .returning(Receipt.id)
+                    .execution_options(synchronize_session=False)
+                )
+                repointed_ids.extend(result.scalars().all())
+                replaced_hashes.append(old.hash)
+
+            removed_hashes = await delete_orphaned_signatures(session, replaced_hashes)
+            await session.commit()
+            session.expunge_all()
+            if removed_hashes:
+                await run_in_threadpool(remove_signature_files, removed_hashes)
+            if repointed_ids:
+                await invalidate_receipts(*repointed_ids)
+            print(
+                f"Processed {processed} signatures "
+                f"({bytes_before:,} -> {bytes_after:,} bytes, {bytes_before - bytes_after:,} saved)"
+            )
+
+    print(f"Done: {processed} processed, {failed} skipped, {bytes_before - bytes_after:,} bytes saved")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Normalize stored signature images")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(backfill_signatures(args.batch_size))
+    finally:
+        shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
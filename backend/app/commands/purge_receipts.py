@@ -0,0 +1,32 @@
+"""
+Hard-delete soft-deleted receipts older than the retention period.
+
+The API runs the same purge in the background every PURGE_INTERVAL_SECONDS;
+this command runs it once, e.g. from cron when the background job is
+disabled (PURGE_INTERVAL_SECONDS=0).
+
+Usage:
+    python -m app.commands.purge_receipts [--days 30] [--batch-size 200]
+"""
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.services.purge_service import purge_deleted_receipts
+
+
+async def purge_receipts(days: int, batch_size: int) -> None:
+    purged = await purge_deleted_receipts(days, batch_size)
+    print(f"Purged {purged} receipts deleted more than {days} days ago")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Purge soft-deleted receipts")
+    parser.add_argument("--days", type=int, default=settings.receipt_retention_days)
+    parser.add_argument("--batch-size", type=int, default=settings.purge_batch_size)
+    args = parser.parse_args()
+    asyncio.run(purge_receipts(args.days, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Restore a backup file into an empty database (disaster recovery).
+
+Same fast path as POST /api/v1/backup/restore (COPY into staging tables, one
+transaction), without going through an HTTP upload. Run it after
+`alembic upgrade head` on the new database, before anyone creates receipts.
+
+Incremental backups (export with since=) given after the full backup are
+applied in order on top of it, like an import with skip_existing=false;
+the chain is checked for gaps before anything is written.
+
+Usage:
+    python -m app.commands.restore_backup receipts_backup.ndjson
+    python -m app.commands.restore_backup receipts_backup.tar
+    python -m app.commands.restore_backup full.tar incremental_1.tar incremental_2.ndjson
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.database import async_session_maker
+from app.services.backup_format import READ_CHUNK_SIZE, BackupArchive, BackupReader
+from app.services.backup_service import (
+    RestoreTargetNotEmpty,
+    import_archive,
+    import_receipts,
+    restore_receipts,
+    validate_backup_chain,
+)
+
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+async def _read_header(path: str) -> Dict[str, Any]:
+    """Backup header (archive manifest), read without going through the receipts"""
+    if path.endswith(".tar"):
+        with open(path, "rb") as f:
+            return BackupArchive(f).manifest
+    # The header comes before the receipts in both JSON and NDJSON backups
+    reader = BackupReader(_file_chunks(path))
+    async for _ in reader.receipts():
+        break
+    return reader.header
+
+
+def _print_errors(result: Dict[str, Any]) -> None:
+    for error in result["errors"]:
+        print(f"{error['receipt_number']}: {error['error']}", file=sys.stderr)
+
+
+async def restore_backup(paths: List[str]) -> int:
+    started = time.monotonic()
+    try:
+        validate_backup_chain([await _read_header(path) for path in paths])
+    except ValueError as e:
+        print(f"Invalid backup chain, nothing was written: {e}", file=sys.stderr)
+        return 1
+
+    full, incrementals = paths[0], paths[1:]
+    async with async_session_maker() as session:
+        try:
+            if full.endswith(".tar"):
+                with open(full, "rb") as f:
+                    result = await restore_receipts(session, BackupArchive(f).receipts())
+            else:
+                result = await restore_receipts(session, BackupReader(_file_chunks(full)).receipts())
+        except RestoreTargetNotEmpty:
+            print("The database already has receipts; use the import instead", file=sys.stderr)
+            return 1
+        except ValueError as e:
+            print(f"Restore failed, nothing was written: {e}", file=sys.stderr)
+            return 1
+
+        print(
+            f"Restored {result['restored']} receipts in {time.monotonic() - started:.1f}s "
+            f"({result['skipped']} duplicates skipped)"
+        )
+
+        for path in incrementals:
+            started = time.monotonic()
+            try:
+                if path.endswith(".tar"):
+                    with open(path, "rb") as f:
+                        result = await import_archive(session, BackupArchive(f), skip_existing=False)
+                else:
+                    reader = BackupReader(_file_chunks(path))
+                    result = await import_receipts(session, reader.receipts(), skip_existing=False)
+            except ValueError as e:
+                print(f"{path}: applying the incremental backup failed: {e}", file=sys.stderr)
+                return 1
+            _print_errors(result)
+            print(
+                f"{path}: {result['imported']} receipts imported, {result['deleted']} deleted "
+                f"in {time.monotonic() - started:.1f}s ({len(result['errors'])} errors)"
+            )
+            if result["errors"]:
+                # Later incrementals assume this one was applied completely
+                print(
+                    "Stopping: fix the errors above and apply the remaining backups with the import",
+                    file=sys.stderr
+                )
+                return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Restore a backup into an empty database")
+    parser.add_argument("path", help="JSON, NDJSON or archive (.tar) backup file")
+    parser.add_argument(
+        "incrementals", nargs="*", metavar="incremental",
+        help="incremental backups of the same formats to apply afterwards, oldest first"
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(restore_backup([args.path, *args.incrementals])))
+
+
+if __name__ == "__main__":
+    main()
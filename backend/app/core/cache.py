@@ -0,0 +1,195 @@
+"""In-process and shared caches."""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Dict-like cache whose entries expire after ttl seconds.
+    Holds at most maxsize entries; the least recently used one is evicted first.
+    Not thread-safe; meant for use from the event loop.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value for key, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BytesCache:
+    """
+    Async cache of bytes values with hit/miss counters.
+    Backends implement _get/_set/_delete/_clear (and optionally stats()).
+    """
+
+    backend = "none"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._set(key, value)
+
+    async def delete(self, *keys: str) -> None:
+        await self._delete(*keys)
+
+    async def clear(self) -> None:
+        await self._clear()
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses}
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def _set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def _delete(self, *keys: str) -> None:
+        pass
+
+    async def _clear(self) -> None:
+        pass
+
+
+class MemoryBytesCache(BytesCache):
+    """
+    Per-process LRU cache bounded by total size in bytes and by TTL.
+    Each worker process has its own copy; invalidations only reach the
+    process that makes them, so other workers keep an entry until it
+    expires; callers that need fresh data must validate what they read
+    (the receipt cache checks the stored version).
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int, ttl: float):
+        super().__init__(ttl)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._pop(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._pop(oldest)
+
+    async def _delete(self, *keys: str) -> None:
+        for key in keys:
+            self._pop(key)
+
+    async def _clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._data), "bytes": self.size}
+
+
+class RedisBytesCache(BytesCache):
+    """
+    Cache shared by all workers, stored in Redis under a key prefix.
+    Needs the optional `redis` package; the size bound is Redis' own
+    maxmemory policy.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, ttl: float, prefix: str = "cache:"):
+        super().__init__(ttl)
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("The redis cache backend requires the 'redis' package") from e
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self.prefix + key)
+
+    async def _set(self, key: str, value: bytes) -> None:
+        await self._client.set(self.prefix + key, value, ex=max(1, int(self.ttl)))
+
+    async def _delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*(self.prefix + key for key in keys))
+
+    async def _clear(self) -> None:
+        batch = []
+        async for key in self._client.scan_iter(match=self.prefix + "*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._client.delete(*batch)
+                batch = []
+        if batch:
+            await self._client.delete(*batch)
+
+
+def build_bytes_cache(backend: str, ttl: float, max_bytes: int, redis_url: str = "", prefix: str = "cache:") -> BytesCache:
+    """Create the cache for a backend name: memory, redis or none"""
+    if backend == "memory":
+        return MemoryBytesCache(max_bytes=max_bytes, ttl=ttl)
+    if backend == "redis":
+        return RedisBytesCache(redis_url, ttl=ttl, prefix=prefix)
+    if backend == "none":
+        return BytesCache(ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
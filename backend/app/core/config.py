@@ -15,6 +15,42 @@ class Settings(BaseSettings):
     receipt_prefix: str = "RECIBO"
     receipt_number_digits: int = 8
 
+    # Optional directory where signature images are materialized as files so
+    # GET /receipts/{id}/signature can be served straight from disk
+    signature_cache_dir: str = ""
+
+    # Signature normalization (crop, downscale, re-encode) on create/update
+    signature_max_width: int = 600
+    signature_max_height: int = 300
+    signature_format: str = "WEBP"  # WEBP (lossless) or PNG
+
+    # Process pool for CPU-bound work such as signature processing
+    process_pool_workers: int = 2
+    process_pool_max_pending: int = 16
+
+    # Receipt count/facet results are cached briefly per filter set
+    facets_cache_ttl_seconds: int = 10
+    # Unfiltered counts on tables at least this large come from planner
+    # statistics instead of a full count
+    facets_estimate_min_rows: int = 100_000
+
+    # Cache of serialized GET /receipts/{id} responses: "memory" (per-process
+    # LRU), "redis" (shared by all workers, needs the redis package) or "none"
+    receipt_cache_backend: str = "memory"
+    receipt_cache_ttl_seconds: int = 300
+    receipt_cache_max_bytes: int = 32 * 1024 * 1024
+    receipt_cache_redis_url: str = "redis://localhost:6379/0"
+
+    # Soft-deleted receipts are purged after this many days by a background
+    # job (every purge_interval_seconds, 0 disables it), in committed batches
+    receipt_retention_days: int = 30
+    purge_interval_seconds: int = 3600
+    purge_batch_size: int = 200
+
+    # Idempotency-Key retention for retried POST/PUT requests (expired keys
+    # are deleted by the same background job as soft-deleted receipts)
+    idempotency_key_ttl_hours: int = 24
+
     # Authentication
     secret_key: str = secrets.token_hex(32)  # Generate random secret if not provided
     algorithm: str = "HS256"
@@ -0,0 +1,95 @@
+"""HTTP validator helpers (ETag / Last-Modified conditional requests)."""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import Request, Response, status
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+    Uses the weak comparison required for If-None-Match (RFC 9110 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    target = opaque(etag)
+    return any(opaque(candidate) == target for candidate in if_none_match.split(","))
+
+
+def _utc(value: datetime) -> datetime:
+    """Timestamps are stored without time zone, in UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def version_etag(key: object, updated_at: datetime, variant: Optional[str] = None) -> str:
+    """
+    Weak ETag for a row version: its key plus updated_at (microseconds)
+    variant distinguishes different representations of the same row
+    """
+    tag = f"{key}-{int(_utc(updated_at).timestamp() * 1_000_000)}"
+    if variant:
+        tag = f"{tag}-{variant}"
+    return f'W/"{tag}"'
+
+
+def parse_if_match(if_match: str) -> Optional[List[str]]:
+    """
+    Opaque tags of an If-Match header, or None for "*"
+    Weak tags are dropped: If-Match uses strong comparison (RFC 9110 13.1.1)
+    """
+    if if_match.strip() == "*":
+        return None
+    tags = [tag.strip() for tag in if_match.split(",")]
+    return [tag.strip('"') for tag in tags if tag.startswith('"') and tag.endswith('"') and len(tag) >= 2]
+
+
+def http_date(value: datetime) -> str:
+    """Format a timestamp for Last-Modified"""
+    return format_datetime(_utc(value), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since for a GET.
+    If-Modified-Since is ignored when If-None-Match is present (RFC 9110 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return _utc(last_modified).replace(microsecond=0) <= since
+
+
+def validator_headers(etag: str, last_modified: datetime, private: bool = False) -> dict:
+    """
+    ETag, Last-Modified and a Cache-Control that makes clients revalidate
+    (without it, browsers may reuse the response heuristically)
+    """
+    return {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+
+
+def not_modified(headers: dict) -> Response:
+    """304 response carrying the validators"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
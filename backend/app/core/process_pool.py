@@ -0,0 +1,42 @@
+"""Bounded process pool for CPU-bound work (e.g. image processing)."""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.process_pool_workers)
+    return _executor
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a picklable function in the process pool without blocking the event loop.
+    At most process_pool_max_pending jobs are queued or running at once;
+    further callers wait here instead of piling up work in the pool.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.process_pool_max_pending)
+
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_process_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool() -> None:
+    """Stop the worker processes (called on application shutdown)"""
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    _slots = None
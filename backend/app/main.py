@@ -1,11 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.process_pool import shutdown_process_pool
+from app.services.purge_service import run_purge_loop
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Purge expired soft-deleted receipts in the background
+    purge_task = None
+    if settings.purge_interval_seconds > 0:
+        purge_task = asyncio.create_task(run_purge_loop())
+
+    yield
+
+    if purge_task is not None:
+        purge_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await purge_task
+    # Stop signature processing workers
+    shutdown_process_pool()
+
 
 app = FastAPI(
     title=settings.app_name,
     debug=settings.debug,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -15,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "X-Backup-Id"],
 )
 
 
@@ -29,10 +54,11 @@ async def health():
 
 
 # API routes
-from app.api.v1 import receipts, auth, backup, templates, settings as settings_router
+from app.api.v1 import receipts, auth, backup, templates, series, settings as settings_router
 
 app.include_router(receipts.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(backup.router, prefix="/api/v1")
 app.include_router(templates.router, prefix="/api/v1")
 app.include_router(settings_router.router, prefix="/api/v1")
+app.include_router(series.router, prefix="/api/v1")
@@ -2,5 +2,9 @@ from app.models.receipt import Receipt, ReceiptItem
 from app.models.user import User
 from app.models.template import ReceiptTemplate
 from app.models.settings import Settings
+from app.models.series import ReceiptSeries
+from app.models.idempotency import IdempotencyKey
+from app.models.signature import Signature
+from app.models.backup import BackupImport, BackupRun
 
-__all__ = ["Receipt", "ReceiptItem", "User", "ReceiptTemplate", "Settings"]
+__all__ = ["Receipt", "ReceiptItem", "User", "ReceiptTemplate", "Settings", "ReceiptSeries", "IdempotencyKey", "Signature", "BackupImport", "BackupRun"]
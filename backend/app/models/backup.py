@@ -0,0 +1,62 @@
+"""Backup bookkeeping models."""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class BackupImport(Base):
+    """Progress of a backup archive import, one row per archive.
+
+    chunks_done is advanced in the same transaction that commits each chunk,
+    so an interrupted import can resume from the first chunk not yet applied.
+    """
+    __tablename__ = "backup_imports"
+
+    archive_id: Mapped[str] = mapped_column(String(64), primary_key=True)  # from the archive manifest
+    chunk_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    chunks_done: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    @property
+    def completed(self) -> bool:
+        return self.chunks_done >= self.chunk_count
+
+    def __repr__(self) -> str:
+        return f"<BackupImport {self.archive_id} - {self.chunks_done}/{self.chunk_count}>"
+
+
+class BackupRun(Base):
+    """One backup export (full or incremental).
+
+    watermark is the point in time the export is complete up to; passing
+    the backup's id as since= to the next export continues from there.
+    """
+    __tablename__ = "backup_runs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex, written into the backup
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # "full" or "incremental"
+    format: Mapped[str] = mapped_column(String(20), nullable=False)
+    since: Mapped[Optional[datetime]] = mapped_column(nullable=True)  # incremental: changes from here on
+    base_backup_id: Mapped[Optional[str]] = mapped_column(String(32))  # when since= named a backup
+    watermark: Mapped[datetime] = mapped_column(nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<BackupRun {self.id} - {self.kind}>"
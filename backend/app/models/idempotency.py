@@ -0,0 +1,40 @@
+"""Idempotency key model."""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key header.
+
+    A retried request with the same key and scope gets the stored response
+    back instead of being executed again. Rows expire after a TTL.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    scope: Mapped[str] = mapped_column(String(255), primary_key=True)  # e.g. "POST /receipts"
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # SHA-256 of the payload
+
+    # Set in the same transaction as the claim, so committed rows always have
+    # a response (NULL only in rows left by older versions, which are reclaimed)
+    status_code: Mapped[Optional[int]] = mapped_column(Integer)
+    response_body: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey {self.scope} {self.key}>"
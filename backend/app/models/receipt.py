@@ -2,12 +2,18 @@ from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
 from typing import List, Optional
-from sqlalchemy import String, Text, Numeric, Date, ForeignKey, Integer, Index, Enum as SQLEnum
+from sqlalchemy import String, Text, Numeric, Date, ForeignKey, Integer, Index, Sequence, literal_column, text, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
 
 from app.core.database import Base
+from app.models.signature import Signature
+
+
+# Counter for the default receipt number series. Values are taken with
+# nextval() inside the insert transaction, so concurrent creates never collide.
+receipt_number_seq = Sequence("receipt_number_seq", metadata=Base.metadata)
 
 
 class ReceiptStatus(str, Enum):
@@ -64,7 +70,10 @@ class Receipt(Base, TimestampMixin):
         index=True
     )
     notes: Mapped[Optional[str]] = mapped_column(Text)
-    signature: Mapped[Optional[str]] = mapped_column(Text)  # Base64 encoded
+    signature_hash: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("signatures.hash"),
+        index=True
+    )  # Image lives in the signatures table
     received_by_name: Mapped[Optional[str]] = mapped_column(String(255))  # Name below signature
 
     # Additional receipt fields
@@ -89,18 +98,63 @@ class Receipt(Base, TimestampMixin):
     # Flexible JSON storage
     custom_fields: Mapped[Optional[dict]] = mapped_column(JSONB)
 
+    # Set by delete_receipt; soft-deleted receipts are hidden from the API
+    # until restored, and purged for good after receipt_retention_days
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+    # Incremented on every update; ORM flushes check it (version_id_col) and
+    # PATCH requests compare it against If-Match
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    # Spanish full-text document (concept, item descriptions, institution,
+    # notes), maintained by database triggers; never loaded by default
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+
     # Relationships
+    # Opt-in: load with selectinload(Receipt.items) where items are needed, so
+    # list queries never fetch line items. Deletes rely on ON DELETE CASCADE.
     items: Mapped[List["ReceiptItem"]] = relationship(
         "ReceiptItem",
         back_populates="receipt",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="raise",
         order_by="ReceiptItem.line_order"
     )
+    # Must be loaded explicitly (joinedload/selectinload) so that receipt
+    # queries never pull signature bytes by accident
+    signature_blob: Mapped[Optional["Signature"]] = relationship(
+        "Signature",
+        lazy="raise"
+    )
 
     __table_args__ = (
-        Index('ix_receipts_created_at', 'created_at'),
+        # Serves ORDER BY created_at DESC, id DESC and keyset pagination of
+        # live receipts (partial: soft-deleted rows are not indexed)
+        Index(
+            'ix_receipts_created_at_id', 'created_at', 'id',
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        # Finds soft-deleted receipts for the purge job
+        Index(
+            'ix_receipts_deleted_at', 'deleted_at',
+            postgresql_where=text('deleted_at IS NOT NULL')
+        ),
+        Index('ix_receipts_search_vector', 'search_vector', postgresql_using='gin'),
+        # Watermark scan of incremental backups (updated_at >= since)
+        Index('ix_receipts_updated_at', 'updated_at'),
     )
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def signature(self) -> Optional[str]:
+        """
+        Signature as a base64 data URL (requires signature_blob to be loaded,
+        or skipped with noload(), in which case it is None)
+        """
+        if self.signature_hash is None or self.signature_blob is None:
+            return None
+        return self.signature_blob.data_url
 
     def __repr__(self) -> str:
         return f"<Receipt {self.receipt_number} - {self.customer_name}>"
@@ -151,3 +205,28 @@ class ReceiptItem(Base, TimestampMixin):
 
     def __repr__(self) -> str:
         return f"<ReceiptItem {self.id} - {self.description[:30]}>"
+
+
+
+# Text searched by the list endpoint's `search` parameter. The GIN trigram
+# index below and the ILIKE predicate in list_receipts both use this exact
+# expression: the planner only uses an expression index when the query repeats
+# it verbatim, so the separators are literal SQL rather than bind parameters.
+# The fields are joined with SEARCH_TEXT_SEPARATOR (the ASCII unit separator),
+# which search terms never contain, so a term cannot match across two fields.
+SEARCH_TEXT_SEPARATOR = "\x1f"
+
+receipt_search_text = (
+    Receipt.receipt_number
+    + literal_column("E'\\x1f'")
+    + func.coalesce(Receipt.customer_name, literal_column("''"))
+    + literal_column("E'\\x1f'")
+    + func.coalesce(Receipt.customer_nit, literal_column("''"))
+)
+
+Index(
+    'ix_receipts_search_trgm',
+    receipt_search_text.label('search_text'),
+    postgresql_using='gin',
+    postgresql_ops={'search_text': 'gin_trgm_ops'},
+)
@@ -0,0 +1,36 @@
+"""Receipt numbering series model."""
+from datetime import datetime
+from sqlalchemy import String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ReceiptSeries(Base):
+    """Named receipt number series (e.g. one per cash desk or branch).
+
+    Each series owns a PostgreSQL sequence, so series allocate numbers
+    independently and never wait on each other.
+    """
+    __tablename__ = "receipt_series"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(40), unique=True, nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    prefix: Mapped[str] = mapped_column(String(10), unique=True, nullable=False)
+    number_digits: Mapped[int] = mapped_column(Integer, nullable=False, server_default="8")
+    sequence_name: Mapped[str] = mapped_column(String(63), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReceiptSeries {self.key} - {self.prefix}>"
@@ -24,6 +24,7 @@ class Settings(Base):
     )
     updated_at: Mapped[datetime] = mapped_column(
         server_default=func.now(),
+        onupdate=func.now(),
         nullable=False
     )
 
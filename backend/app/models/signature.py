@@ -0,0 +1,38 @@
+"""Signature image store model."""
+import base64
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class Signature(Base):
+    """Content-addressed signature images, keyed by the SHA-256 of the bytes.
+
+    Receipts reference signatures by hash, so identical images are stored
+    once and the receipts row stays small.
+    """
+    __tablename__ = "signatures"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # hex SHA-256 of data
+    content_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Size as received from the client; NULL if the image was stored unprocessed
+    original_size_bytes: Mapped[Optional[int]] = mapped_column(Integer)
+
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        nullable=False
+    )
+
+    @property
+    def data_url(self) -> str:
+        """Image as a base64 data URL, the format the API accepts and returns"""
+        return f"data:{self.content_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def __repr__(self) -> str:
+        return f"<Signature {self.hash[:12]} - {self.size_bytes} bytes>"
@@ -1,11 +1,22 @@
 from app.schemas.receipt import (
     ReceiptCreate,
     ReceiptUpdate,
+    ReceiptPatch,
     ReceiptResponse,
     ReceiptListResponse,
+    ReceiptSearchResult,
+    ReceiptFacetsResponse,
+    FacetCount,
     ReceiptItemCreate,
     ReceiptItemUpdate,
+    ReceiptItemUpsert,
     ReceiptItemResponse,
+    ReceiptBatchResult,
+    ReceiptBatchResponse,
+    ReceiptFilter,
+    ReceiptStatusChange,
+    ReceiptStatusSkipped,
+    ReceiptStatusChangeResponse,
 )
 from app.schemas.auth import (
     Token,
@@ -20,11 +31,22 @@ from app.schemas.auth import (
 __all__ = [
     "ReceiptCreate",
     "ReceiptUpdate",
+    "ReceiptPatch",
     "ReceiptResponse",
     "ReceiptListResponse",
+    "ReceiptSearchResult",
+    "ReceiptFacetsResponse",
+    "FacetCount",
     "ReceiptItemCreate",
     "ReceiptItemUpdate",
+    "ReceiptItemUpsert",
     "ReceiptItemResponse",
+    "ReceiptBatchResult",
+    "ReceiptBatchResponse",
+    "ReceiptFilter",
+    "ReceiptStatusChange",
+    "ReceiptStatusSkipped",
+    "ReceiptStatusChangeResponse",
     "Token",
     "TokenData",
     "UserBase",
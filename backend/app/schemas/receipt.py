@@ -2,7 +2,7 @@ from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
 from typing import List, Optional
-from pydantic import BaseModel, ConfigDict, Field, field_validator, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator, EmailStr
 
 
 class ReceiptStatus(str, Enum):
@@ -26,6 +26,11 @@ class ReceiptItemCreate(ReceiptItemBase):
     pass
 
 
+class ReceiptItemUpsert(ReceiptItemBase):
+    """Schema for items in a receipt update (the full new item list)"""
+    id: Optional[int] = None  # Existing item to update; matched by line order if omitted
+
+
 class ReceiptItemUpdate(BaseModel):
     """Schema for updating receipt items"""
     description: Optional[str] = Field(None, min_length=1, max_length=1000)
@@ -74,6 +79,7 @@ class ReceiptBase(BaseModel):
 class ReceiptCreate(ReceiptBase):
     """Schema for creating receipts"""
     status: Optional[ReceiptStatus] = ReceiptStatus.COMPLETED
+    series: Optional[str] = Field(None, max_length=40)  # Numbering series key, default series if omitted
     items: List[ReceiptItemCreate] = Field(..., min_length=1)
 
     @field_validator('items')
@@ -102,7 +108,47 @@ class ReceiptUpdate(BaseModel):
     check_number: Optional[str] = Field(None, max_length=50)  # Check number for Cheque payments
     bank_account: Optional[str] = Field(None, max_length=100)  # Bank account for Transferencia payments
     custom_fields: Optional[dict] = None
-    items: Optional[List[ReceiptItemCreate]] = None
+    items: Optional[List[ReceiptItemUpsert]] = None
+
+    @field_validator('payment_method')
+    @classmethod
+    def validate_payment_method(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and v not in ['Cheque', 'Transferencia', 'Efectivo', 'Otro']:
+            raise ValueError('payment_method must be Cheque, Transferencia, Efectivo, or Otro')
+        return v
+
+
+class ReceiptPatch(BaseModel):
+    """
+    Schema for JSON Merge Patch (RFC 7396) documents: present keys are set,
+    null clears a field and custom_fields is merged recursively.
+    Items cannot be patched (use PUT).
+    """
+    customer_name: Optional[str] = Field(None, max_length=255)
+    customer_nit: Optional[str] = Field(None, max_length=50)
+    customer_phone: Optional[str] = Field(None, max_length=50)
+    customer_email: Optional[EmailStr] = None
+    customer_address: Optional[str] = Field(None, max_length=500)
+    date: Optional[date] = None
+    status: Optional[ReceiptStatus] = None
+    notes: Optional[str] = None
+    signature: Optional[str] = None
+    received_by_name: Optional[str] = Field(None, max_length=255)
+    institution: Optional[str] = Field(None, max_length=255)
+    concept: Optional[str] = Field(None, max_length=500)
+    payment_method: Optional[str] = Field(None, max_length=50)
+    check_number: Optional[str] = Field(None, max_length=50)
+    bank_account: Optional[str] = Field(None, max_length=100)
+    custom_fields: Optional[dict] = None
+
+    model_config = ConfigDict(extra='forbid')
+
+    @field_validator('date', 'status')
+    @classmethod
+    def validate_not_null(cls, v):
+        if v is None:
+            raise ValueError('cannot be null')
+        return v
 
     @field_validator('payment_method')
     @classmethod
@@ -125,6 +171,7 @@ class ReceiptResponse(BaseModel):
     status: ReceiptStatus
     notes: Optional[str] = None
     signature: Optional[str] = None
+    signature_hash: Optional[str] = None  # Image also served at /receipts/{id}/signature
     received_by_name: Optional[str] = None  # Name below signature
     institution: Optional[str] = None
     concept: Optional[str] = None
@@ -137,6 +184,7 @@ class ReceiptResponse(BaseModel):
     items: List[ReceiptItemResponse]
     created_at: datetime
     updated_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -153,3 +201,78 @@ class ReceiptListResponse(BaseModel):
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class FacetCount(BaseModel):
+    """Number of receipts with one value of a field"""
+    value: Optional[str] = None
+    count: int
+
+
+class ReceiptFacetsResponse(BaseModel):
+    """Schema for receipt counts and breakdowns"""
+    total: int
+    estimated: bool  # True when counts come from planner statistics
+    status: List[FacetCount]
+    payment_method: List[FacetCount]
+
+
+class ReceiptSearchResult(ReceiptListResponse):
+    """Schema for full-text search hits"""
+    rank: float
+    snippet: Optional[str] = None  # Matching fragments, terms wrapped in <b></b>
+
+
+class ReceiptBatchResult(BaseModel):
+    """Outcome of one entry of a batch create"""
+    index: int
+    success: bool
+    receipt_id: Optional[int] = None
+    receipt_number: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ReceiptBatchResponse(BaseModel):
+    """Schema for batch create responses"""
+    created: int
+    failed: int
+    results: List[ReceiptBatchResult]
+
+
+class ReceiptFilter(BaseModel):
+    """Receipt list filters (same meaning as the list endpoint's query parameters)"""
+    search: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    status: Optional[ReceiptStatus] = None
+
+
+class ReceiptStatusChange(BaseModel):
+    """Schema for bulk status changes: exactly one of ids, receipt_numbers or filter"""
+    status: ReceiptStatus
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    receipt_numbers: Optional[List[str]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[ReceiptFilter] = None
+
+    @model_validator(mode='after')
+    def validate_single_selector(self) -> 'ReceiptStatusChange':
+        selectors = [self.ids, self.receipt_numbers, self.filter]
+        if sum(selector is not None for selector in selectors) != 1:
+            raise ValueError('provide exactly one of ids, receipt_numbers or filter')
+        return self
+
+
+class ReceiptStatusSkipped(BaseModel):
+    """A selected receipt whose status was not changed"""
+    id: Optional[int] = None
+    receipt_number: Optional[str] = None
+    status: Optional[ReceiptStatus] = None  # None if the receipt does not exist
+    reason: str
+
+
+class ReceiptStatusChangeResponse(BaseModel):
+    """Schema for bulk status change responses"""
+    status: ReceiptStatus
+    updated: int
+    updated_ids: List[int]
+    skipped: List[ReceiptStatusSkipped]  # Only reported for ids / receipt_numbers
@@ -0,0 +1,40 @@
+"""Receipt numbering series schemas."""
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from app.core.config import settings
+
+# receipts.receipt_number is VARCHAR(20): prefix + "-" + digits must fit
+RECEIPT_NUMBER_MAX_LENGTH = 20
+
+
+class SeriesCreate(BaseModel):
+    """Schema for creating a numbering series."""
+    key: str = Field(..., min_length=1, max_length=40, pattern=r"^[a-z0-9_]+$")
+    name: str = Field(..., min_length=1, max_length=255)
+    prefix: str = Field(..., min_length=1, max_length=10, pattern=r"^[A-Z0-9]+$")
+    number_digits: int = Field(default=8, ge=1, le=18)
+    start_number: int = Field(default=1, ge=1)
+
+    @model_validator(mode='after')
+    def validate_number_format(self) -> 'SeriesCreate':
+        if len(self.prefix) + 1 + self.number_digits > RECEIPT_NUMBER_MAX_LENGTH:
+            raise ValueError(
+                f'prefix and number_digits exceed {RECEIPT_NUMBER_MAX_LENGTH} characters'
+            )
+        if self.prefix == settings.receipt_prefix:
+            raise ValueError('prefix is already used by the default series')
+        return self
+
+
+class SeriesResponse(BaseModel):
+    """Schema for numbering series responses."""
+    id: int
+    key: str
+    name: str
+    prefix: str
+    number_digits: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,17 +1,21 @@
 from app.services.receipt_service import (
     create_receipt,
+    create_receipts_batch,
     get_receipt,
     get_receipt_by_number,
     list_receipts,
+    search_receipts,
     update_receipt,
     delete_receipt,
 )
 
 __all__ = [
     "create_receipt",
+    "create_receipts_batch",
     "get_receipt",
     "get_receipt_by_number",
     "list_receipts",
+    "search_receipts",
     "update_receipt",
     "delete_receipt",
 ]
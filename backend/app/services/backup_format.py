@@ -0,0 +1,294 @@
+"""Backup file formats: incremental JSON/NDJSON reader and the chunked archive."""
+import codecs
+import gzip
+import hashlib
+import json
+import tarfile
+import zlib
+from typing import Any, AsyncIterator, BinaryIO, Dict, List
+
+from fastapi.concurrency import run_in_threadpool
+
+# Bytes pulled from the upload per read
+READ_CHUNK_SIZE = 64 * 1024
+
+# Largest single JSON value (one receipt with its signature) the reader will
+# buffer; anything bigger is treated as a corrupt file instead of eating memory
+MAX_RECORD_CHARS = 32 * 1024 * 1024
+
+WHITESPACE = " \t\r\n"
+
+_decoder = json.JSONDecoder()
+
+
+class BackupReader:
+    """
+    Pull receipts out of a backup file without loading it whole.
+
+    Accepts both shapes written by stream_backup:
+    - the JSON backup object, whose "receipts" array is walked one element
+      at a time (the other top-level keys end up in header)
+    - NDJSON, where each line is a receipt, except a leading header line
+      without receipt_number
+
+    Only the receipt being decoded is held in memory, however the file is
+    laid out (single line, indented, ...). Raises ValueError on invalid input.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.header: Dict[str, Any] = {}
+        self.found_receipts = False  # a "receipts" array or a receipt line was seen
+
+    async def _fill(self) -> bool:
+        """Append the next chunk to the buffer; False at end of input"""
+        if self._eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            chunk = b""
+        try:
+            text = self._text.decode(chunk, final=self._eof)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"File is not valid UTF-8: {e}")
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        if len(self._buffer) > MAX_RECORD_CHARS:
+            raise ValueError("Record too large")
+        return not self._eof
+
+    async def _peek(self) -> str:
+        """Next non-whitespace character, not consumed ("" at end of input)"""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buffer):
+                return buffer[self._pos]
+            if not await self._fill() and self._pos >= len(self._buffer):
+                return ""
+
+    async def _expect(self, allowed: str) -> str:
+        """Consume the next character, which must be one of allowed"""
+        char = await self._peek()
+        if not char or char not in allowed:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"Expected one of {allowed!r}, found {found}")
+        self._pos += 1
+        return char
+
+    async def _value(self) -> Any:
+        """Decode the next complete JSON value, reading more input as needed"""
+        await self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+                # A number that stops at the end of the buffer may continue
+                # in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise ValueError(f"Invalid JSON: {e}")
+            await self._fill()
+
+    async def _array(self) -> AsyncIterator[Any]:
+        """Yield the elements of an array whose "[" was just consumed"""
+        if await self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield await self._value()
+            if await self._expect(",]") == "]":
+                return
+
+    async def _object(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Read one top-level object. Receipts found in it (elements of a
+        "receipts" array, or the object itself if it is an NDJSON receipt
+        line) are yielded; other keys go to header.
+        """
+        # Fast path: an NDJSON line usually fits in the buffer already
+        try:
+            record, end = _decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            record = None
+        if isinstance(record, dict) and (end < len(self._buffer) or self._eof):
+            self._pos = end
+            if isinstance(record.get("receipts"), list):
+                # A backup object small enough to arrive in one piece
+                self.found_receipts = True
+                receipts = record.pop("receipts")
+                self.header.update(record)
+                for receipt in receipts:
+                    yield receipt
+        else:
+            # The object is larger than the buffer (the JSON backup object):
+            # walk it key by key so its receipts can be streamed
+            record = {}
+            await self._expect("{")
+            if await self._peek() == "}":
+                self._pos += 1
+            else:
+                while True:
+                    key = await self._value()
+                    if not isinstance(key, str):
+                        raise ValueError("Expected an object key")
+                    await self._expect(":")
+                    if key == "receipts" and await self._peek() == "[":
+                        self._pos += 1
+                        self.found_receipts = True
+                        # Keys before the array are the header: readable
+                        # as soon as the first receipt is
+                        self.header.update(record)
+                        async for receipt in self._array():
+                            yield receipt
+                    else:
+                        record[key] = await self._value()
+                    if await self._expect(",}") == "}":
+                        break
+
+        if "receipt_number" in record:
+            self.found_receipts = True
+            yield record
+        else:
+            self.header.update(record)
+
+    async def receipts(self) -> AsyncIterator[Any]:
+        """Yield every receipt in the file, in file order"""
+        while await self._peek():
+            if self._buffer[self._pos] != "{":
+                raise ValueError("Backup must be a JSON object or one JSON object per line")
+            async for receipt in self._object():
+                yield receipt
+
+
+# Archive format: an (uncompressed) tar of gzip-compressed NDJSON chunks,
+# chunks/000001.ndjson.gz, ..., followed by manifest.json listing every chunk
+# with its receipt count and the SHA-256 of its compressed bytes. The
+# manifest comes last because counts and checksums are only known once the
+# export has streamed every chunk.
+ARCHIVE_FORMAT = "receipts-backup-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_MEDIA_TYPE = "application/x-tar"
+MANIFEST_NAME = "manifest.json"
+
+
+def archive_chunk_name(index: int) -> str:
+    return f"chunks/{index + 1:06d}.ndjson.gz"
+
+
+def tar_member(name: str, data: bytes, mtime: int) -> bytes:
+    """One tar member (header, data, padding), for writing a tar as a stream"""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT) + data + b"\0" * (-len(data) % tarfile.BLOCKSIZE)
+
+
+def tar_end() -> bytes:
+    """End-of-archive marker (two zero blocks)"""
+    return b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+class BackupArchive:
+    """
+    Read a backup archive from a seekable file (e.g. a spooled upload).
+
+    The manifest is read up front; chunks are read, checksum-verified and
+    decompressed one at a time with read_chunk(). Raises ValueError if the
+    file is not a complete archive, the manifest is malformed or a chunk
+    fails verification.
+
+    Opening the archive and read_chunk() block on file I/O and
+    decompression; async code should call them through run_in_threadpool
+    (open_archive, receipts() do).
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        try:
+            self._tar = tarfile.open(fileobj=fileobj, mode="r:")
+        except tarfile.TarError as e:
+            raise ValueError(f"Not a backup archive: {e}")
+        try:
+            manifest = json.loads(self._read(MANIFEST_NAME))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid manifest: {e}")
+        if not isinstance(manifest, dict) or manifest.get("format") != ARCHIVE_FORMAT:
+            raise ValueError("Not a backup archive")
+        archive_version = manifest.get("archive_version", 0)
+        if not isinstance(archive_version, int) or archive_version > ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version {archive_version!r}")
+        self.manifest = manifest
+        self.chunks: List[Dict[str, Any]] = _manifest_chunks(manifest.get("chunks"))
+
+    def _read(self, name: str) -> bytes:
+        try:
+            member = self._tar.getmember(name)
+        except KeyError:
+            raise ValueError(f"Archive is incomplete: {name} is missing")
+        except tarfile.TarError as e:
+            raise ValueError(f"Archive is damaged: {e}")
+        # Directories, links and devices have no data to extract
+        if not member.isfile():
+            raise ValueError(f"Archive is damaged: {name} is not a regular file")
+        try:
+            return self._tar.extractfile(member).read()
+        except (tarfile.TarError, OSError) as e:
+            raise ValueError(f"Archive is damaged: {e}")
+
+    def read_chunk(self, index: int) -> List[Any]:
+        """Receipts of chunk index (0-based), after checking its checksum and count"""
+        chunk = self.chunks[index]
+        data = self._read(chunk["name"])
+        if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+            raise ValueError(f"Chunk {index + 1} ({chunk['name']}) is corrupt: checksum mismatch")
+        try:
+            lines = gzip.decompress(data).decode("utf-8").splitlines()
+            receipts = [json.loads(line) for line in lines if line.strip()]
+        except (OSError, EOFError, zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Chunk {index + 1} ({chunk['name']}) is unreadable: {e}")
+        if len(receipts) != chunk["receipts"]:
+            raise ValueError(
+                f"Chunk {index + 1} ({chunk['name']}) has {len(receipts)} receipts, "
+                f"the manifest says {chunk['receipts']}"
+            )
+        return receipts
+
+    async def receipts(self) -> AsyncIterator[Any]:
+        """Yield every receipt in the archive, chunk by chunk (read off the event loop)"""
+        for index in range(len(self.chunks)):
+            for receipt in await run_in_threadpool(self.read_chunk, index):
+                yield receipt
+
+
+def _manifest_chunks(chunks: Any) -> List[Dict[str, Any]]:
+    """The manifest's chunk list, checked so read_chunk can trust its entries"""
+    if chunks is None:
+        return []
+    if not isinstance(chunks, list):
+        raise ValueError("Invalid manifest: chunks must be a list")
+    for number, chunk in enumerate(chunks, start=1):
+        if not (
+            isinstance(chunk, dict)
+            and isinstance(chunk.get("name"), str)
+            and isinstance(chunk.get("sha256"), str)
+            and isinstance(chunk.get("receipts"), int)
+            and not isinstance(chunk.get("receipts"), bool)
+            and chunk["receipts"] >= 0
+        ):
+            raise ValueError(f"Invalid manifest: chunk {number} needs a name, sha256 and receipt count")
+    return chunks
+
+
+async def open_archive(fileobj: BinaryIO) -> BackupArchive:
+    """Open a BackupArchive without blocking the event loop (scanning the tar reads the whole file)"""
+    return await run_in_threadpool(BackupArchive, fileobj)
@@ -0,0 +1,147 @@
+"""Streaming receipt export (NDJSON / CSV) for large date ranges."""
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from app.core.database import async_session_maker
+from app.models.receipt import Receipt, ReceiptItem, ReceiptStatus
+from app.services.receipt_service import apply_list_filters
+
+# Rows fetched per round trip from the server-side cursor. Output is written
+# in chunks of the same size, so memory stays flat for any export size.
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_COLUMNS = (
+    Receipt.id,
+    Receipt.receipt_number,
+    Receipt.date,
+    Receipt.status,
+    Receipt.customer_name,
+    Receipt.customer_nit,
+    Receipt.institution,
+    Receipt.concept,
+    Receipt.payment_method,
+    Receipt.subtotal,
+    Receipt.total,
+    Receipt.created_at,
+)
+RECEIPT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+ITEM_FIELDS = ["line_order", "description", "quantity", "unit_price", "total"]
+ITEM_COLUMNS = tuple(getattr(ReceiptItem, name).label(f"item_{name}") for name in ITEM_FIELDS)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _value(value: Any) -> Any:
+    """Convert a column value to its JSON/CSV form"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+async def _receipt_batches(
+    include_items: bool,
+    search: Optional[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+    status: Optional[ReceiptStatus]
+) -> AsyncIterator[List[dict]]:
+    """
+    Read matching receipts through a server-side cursor, newest first, and
+    yield them as lists of dicts (with an "items" list if include_items)
+    """
+    columns = EXPORT_COLUMNS + ITEM_COLUMNS if include_items else EXPORT_COLUMNS
+    stmt = select(*columns)
+    if include_items:
+        # One outer join ordered by receipt keeps each receipt's items adjacent
+        stmt = stmt.outerjoin(ReceiptItem)
+    stmt = apply_list_filters(stmt, search, date_from, date_to, status)
+    stmt = stmt.order_by(Receipt.created_at.desc(), Receipt.id.desc())
+    if include_items:
+        stmt = stmt.order_by(ReceiptItem.line_order)
+
+    # Own session: the response body is sent after the request's session closed
+    async with async_session_maker() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        pending: Optional[dict] = None  # may still get items from the next partition
+        async for partition in result.partitions():
+            batch = []
+            for row in partition:
+                if pending is None or pending["id"] != row.id:
+                    if pending is not None:
+                        batch.append(pending)
+                    pending = {field: _value(getattr(row, field)) for field in RECEIPT_FIELDS}
+                    if include_items:
+                        pending["items"] = []
+                if include_items and row.item_line_order is not None:
+                    pending["items"].append(
+                        {field: _value(getattr(row, f"item_{field}")) for field in ITEM_FIELDS}
+                    )
+            if batch:
+                yield batch
+        if pending is not None:
+            yield [pending]
+
+
+def _csv_chunk(rows: List[list]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_receipts(
+    fmt: str = "ndjson",
+    include_items: bool = False,
+    search: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[ReceiptStatus] = None
+) -> AsyncIterator[str]:
+    """
+    Yield receipts matching the list filters as NDJSON or CSV text chunks.
+
+    NDJSON: one receipt object per line, with an "items" array if include_items.
+    CSV: one row per receipt. With include_items a leading record_type column
+    is added and each "receipt" row is followed by its "item" rows, which
+    repeat id and receipt_number and fill the item_* columns.
+    """
+    batches = _receipt_batches(include_items, search, date_from, date_to, status)
+
+    if fmt == "ndjson":
+        async for batch in batches:
+            yield "".join(json.dumps(receipt) + "\n" for receipt in batch)
+        return
+
+    item_header = [f"item_{field}" for field in ITEM_FIELDS]
+    if not include_items:
+        yield _csv_chunk([RECEIPT_FIELDS])
+        async for batch in batches:
+            yield _csv_chunk([[receipt[field] for field in RECEIPT_FIELDS] for receipt in batch])
+        return
+
+    blank_receipt = [""] * (len(RECEIPT_FIELDS) - 2)
+    blank_item = [""] * len(ITEM_FIELDS)
+    yield _csv_chunk([["record_type", *RECEIPT_FIELDS, *item_header]])
+    async for batch in batches:
+        rows = []
+        for receipt in batch:
+            rows.append(["receipt", *(receipt[field] for field in RECEIPT_FIELDS), *blank_item])
+            for item in receipt["items"]:
+                rows.append([
+                    "item", receipt["id"], receipt["receipt_number"], *blank_receipt,
+                    *(item[field] for field in ITEM_FIELDS),
+                ])
+        yield _csv_chunk(rows)
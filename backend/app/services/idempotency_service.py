@@ -0,0 +1,130 @@
+"""Idempotency key service for safely retried requests."""
+import asyncio
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Optional
+from sqlalchemy import select, update, delete, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.idempotency import IdempotencyKey
+
+# Claim attempts when the key keeps disappearing between the claim and the
+# lookup (purged or taken over in between)
+RESERVE_ATTEMPTS = 3
+
+
+class IdempotencyKeyBusy(Exception):
+    """The key changed hands on every claim attempt"""
+
+
+def fingerprint(payload: Any) -> str:
+    """SHA-256 of the canonical JSON form of a request payload"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+async def reserve_key(
+    session: AsyncSession,
+    key: str,
+    scope: str,
+    request_hash: str
+) -> Optional[IdempotencyKey]:
+    """
+    Claim an idempotency key for a new request, inside the caller's
+    transaction (see app.api.idempotency), without committing.
+    Returns None if the key was claimed (the caller must run the request
+    and complete_key in the same transaction), otherwise the existing
+    completed record for that key. While another transaction holds an
+    uncommitted claim on the key, this waits for it to finish.
+    Expired records are taken over as if they did not exist, and so are
+    records without a response (left by versions that committed the claim
+    on its own).
+    Raises IdempotencyKeyBusy if the key disappears on every attempt.
+    """
+    expires_at = func.now() + timedelta(hours=settings.idempotency_key_ttl_hours)
+    stmt = insert(IdempotencyKey).values(
+        key=key,
+        scope=scope,
+        request_hash=request_hash,
+        expires_at=expires_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.key, IdempotencyKey.scope],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": None,
+            "response_body": None,
+            "created_at": func.now(),
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=or_(IdempotencyKey.expires_at < func.now(), IdempotencyKey.status_code.is_(None)),
+    ).returning(IdempotencyKey.key)
+
+    for _ in range(RESERVE_ATTEMPTS):
+        claimed = await session.scalar(stmt)
+        if claimed is not None:
+            return None
+
+        result = await session.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.scope == scope,
+            )
+        )
+        existing = result.scalar_one_or_none()
+        if existing is not None:
+            return existing
+        # Gone since the claim failed (purged): try again
+    raise IdempotencyKeyBusy()
+
+
+async def complete_key(
+    session: AsyncSession,
+    key: str,
+    scope: str,
+    status_code: int,
+    response_body: Any
+) -> None:
+    """
+    Store the response of a finished request under its claimed key
+    Does not commit: it must commit together with the request's writes
+    """
+    await session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.scope == scope)
+        .values(status_code=status_code, response_body=response_body)
+    )
+
+
+async def purge_expired_keys(batch_size: int = 500) -> int:
+    """
+    Delete expired idempotency keys (ix_idempotency_keys_expires_at) in
+    batches of batch_size, each in its own short transaction; rows locked
+    by a request taking the key over are skipped
+    Returns the number of keys deleted
+    """
+    purged = 0
+    async with async_session_maker() as session:
+        while True:
+            batch = (
+                select(IdempotencyKey.key, IdempotencyKey.scope)
+                .where(IdempotencyKey.expires_at < func.now())
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = await session.execute(
+                delete(IdempotencyKey)
+                .where(tuple_(IdempotencyKey.key, IdempotencyKey.scope).in_(batch))
+                .returning(IdempotencyKey.key)
+                .execution_options(synchronize_session=False)
+            )
+            count = len(result.all())
+            await session.commit()
+            purged += count
+            if count < batch_size:
+                return purged
+            await asyncio.sleep(0)
@@ -0,0 +1,84 @@
+"""Hard-delete soft-deleted receipts once their retention period is over."""
+import asyncio
+import logging
+from datetime import timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.receipt import Receipt
+from app.services.idempotency_service import purge_expired_keys
+from app.services.signature_service import delete_orphaned_signatures, remove_signature_files
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_deleted_receipts(
+    retention_days: int,
+    batch_size: int = 200
+) -> int:
+    """
+    Hard-delete receipts soft-deleted more than retention_days ago (items go
+    with them through ON DELETE CASCADE), together with the signatures no
+    remaining receipt uses (and their on-disk cache files)
+    Works in batches of batch_size receipts, each in its own short
+    transaction; rows locked by other transactions are skipped, so several
+    workers can purge at once without blocking each other or live requests
+    Returns the number of receipts purged
+    """
+    purged = 0
+    async with async_session_maker() as session:
+        while True:
+            batch = (
+                select(Receipt.id)
+                .where(Receipt.deleted_at < func.now() - timedelta(days=retention_days))
+                .order_by(Receipt.deleted_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = await session.execute(
+                delete(Receipt)
+                .where(Receipt.id.in_(batch))
+                .returning(Receipt.id, Receipt.signature_hash)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            count = len(rows)
+            hashes = list({row.signature_hash for row in rows if row.signature_hash})
+            deleted_hashes = await delete_orphaned_signatures(session, hashes)
+            await session.commit()
+            if deleted_hashes:
+                await run_in_threadpool(remove_signature_files, deleted_hashes)
+            purged += count
+            if count < batch_size:
+                return purged
+            # Let other work run between batches
+            await asyncio.sleep(0)
+
+
+async def run_purge_loop() -> None:
+    """
+    Background task: every purge_interval_seconds, purge expired
+    soft-deleted receipts and expired idempotency keys
+    """
+    while True:
+        await asyncio.sleep(settings.purge_interval_seconds)
+        try:
+            purged = await purge_deleted_receipts(settings.receipt_retention_days, settings.purge_batch_size)
+            if purged:
+                logger.info("Purged %d soft-deleted receipts", purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Receipt purge failed")
+        try:
+            purged = await purge_expired_keys(settings.purge_batch_size)
+            if purged:
+                logger.info("Purged %d expired idempotency keys", purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Idempotency key purge failed")
@@ -0,0 +1,80 @@
+"""Read-through cache of serialized GET /receipts/{id} responses."""
+import logging
+from typing import Optional
+
+from app.core.cache import build_bytes_cache
+from app.core.config import settings
+from app.models.receipt import Receipt
+from app.schemas.receipt import ReceiptResponse
+
+logger = logging.getLogger(__name__)
+
+receipt_cache = build_bytes_cache(
+    settings.receipt_cache_backend,
+    ttl=settings.receipt_cache_ttl_seconds,
+    max_bytes=settings.receipt_cache_max_bytes,
+    redis_url=settings.receipt_cache_redis_url,
+    prefix="receipts:",
+)
+
+
+def _key(receipt_id: int, include_signature: bool) -> str:
+    return f"{receipt_id}:{'sig' if include_signature else 'nosig'}"
+
+
+async def get_cached_receipt(receipt_id: int, include_signature: bool, version: int) -> Optional[bytes]:
+    """
+    Cached JSON body of a receipt at the given (current) version, or None
+    on a miss. An entry stored for another version is stale (a write that
+    raced its fill, or one invalidated in another worker) and is dropped.
+    Cache backend errors count as a miss
+    """
+    key = _key(receipt_id, include_signature)
+    try:
+        value = await receipt_cache.get(key)
+        if value is None:
+            return None
+        # Stored as "<version> <updated_at ISO>\n<JSON body>"
+        stamp, body = value.split(b"\n", 1)
+        if int(stamp.split(b" ", 1)[0]) != version:
+            await receipt_cache.delete(key)
+            return None
+    except Exception as e:
+        logger.warning("Receipt cache read failed: %s", e)
+        return None
+    return body
+
+
+async def cache_receipt(receipt: Receipt, include_signature: bool, current_version: int) -> bytes:
+    """
+    Serialize a loaded receipt as ReceiptResponse JSON and return the body.
+    It is only cached if it is not older than current_version, the version
+    the request started from, so a slow fill cannot outlive a newer write
+    """
+    body = ReceiptResponse.model_validate(receipt).model_dump_json().encode("utf-8")
+    if receipt.version < current_version:
+        return body
+    stamp = f"{receipt.version} {receipt.updated_at.isoformat()}"
+    value = stamp.encode("ascii") + b"\n" + body
+    try:
+        await receipt_cache.set(_key(receipt.id, include_signature), value)
+    except Exception as e:
+        logger.warning("Receipt cache write failed: %s", e)
+    return body
+
+
+async def invalidate_receipts(*receipt_ids: int) -> None:
+    """Drop cached responses of the given receipts (call after committing changes)"""
+    keys = [_key(receipt_id, flag) for receipt_id in receipt_ids for flag in (True, False)]
+    try:
+        await receipt_cache.delete(*keys)
+    except Exception as e:
+        logger.error("Receipt cache invalidation failed: %s", e)
+
+
+async def invalidate_all_receipts() -> None:
+    """Drop every cached receipt response (e.g. after a backup import)"""
+    try:
+        await receipt_cache.clear()
+    except Exception as e:
+        logger.error("Receipt cache invalidation failed: %s", e)
@@ -1,42 +1,207 @@
-from datetime import date
-from decimal import Decimal
-from typing import List, Optional
-from sqlalchemy import select, or_, func, and_
+import asyncio
+import base64
+import binascii
+import json
+import re
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import select, insert, update, delete, func, and_, text, cast, true, literal, literal_column, tuple_, Text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.dialects.postgresql import JSONB, REGCLASS
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy.orm import selectinload, joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models.receipt import Receipt, ReceiptItem, ReceiptStatus
-from app.schemas.receipt import ReceiptCreate, ReceiptUpdate
+from app.models.receipt import (
+    Receipt, ReceiptItem, ReceiptStatus, SEARCH_TEXT_SEPARATOR, receipt_number_seq, receipt_search_text
+)
+from app.models.series import ReceiptSeries
+from app.models.signature import Signature
+from app.schemas.receipt import ReceiptCreate, ReceiptUpdate, ReceiptItemCreate, ReceiptItemUpsert
+from app.services.receipt_cache import invalidate_receipts
+from app.services.series_service import get_series
+from app.services.signature_service import prepare_signature, save_signatures, store_signature
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 
-async def generate_receipt_number(session: AsyncSession) -> str:
+DEFAULT_SEQUENCE_NAME = "receipt_number_seq"
+
+
+def format_receipt_number(
+    value: int,
+    prefix: Optional[str] = None,
+    digits: Optional[int] = None
+) -> str:
     """
-    Generate next receipt number in format RECIBO-00000001
-    Thread-safe implementation using database query
+    Format a counter value as a receipt number, e.g. 1 -> RECIBO-00000001
+    Defaults to the prefix and padding of the default series
     """
-    # Query the highest receipt number
-    stmt = select(Receipt.receipt_number).order_by(Receipt.id.desc()).limit(1)
-    result = await session.execute(stmt)
-    last_receipt_number = result.scalar_one_or_none()
+    prefix = prefix or settings.receipt_prefix
+    digits = digits or settings.receipt_number_digits
+    return f"{prefix}-{value:0{digits}d}"
+
+
+def _next_value_sql(sequence_name: str) -> str:
+    """SQL expression for the value nextval() will return, without consuming it"""
+    return (
+        "(SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END "
+        f'FROM "{sequence_name}")'
+    )
+
+
+async def generate_receipt_number(
+    session: AsyncSession,
+    series_key: Optional[str] = None
+) -> str:
+    """
+    Allocate the next receipt number in format RECIBO-00000001
+    Uses nextval() on the series sequence (receipt_number_seq for the default
+    series), which is atomic across concurrent transactions, so two requests
+    can never receive the same number. Each named series has its own
+    sequence, so desks using different series never wait on each other.
+    Numbers taken by a transaction that rolls back are not reused.
+    """
+    if series_key is None:
+        next_number = await session.scalar(select(receipt_number_seq.next_value()))
+        return format_receipt_number(next_number)
+
+    # Read the series format and take its next value in one statement
+    stmt = select(
+        ReceiptSeries.prefix,
+        ReceiptSeries.number_digits,
+        func.nextval(cast(ReceiptSeries.sequence_name, REGCLASS)),
+    ).where(ReceiptSeries.key == series_key)
+    row = (await session.execute(stmt)).one_or_none()
+    if row is None:
+        raise ValueError(f"Receipt series '{series_key}' not found")
+
+    prefix, digits, next_number = row
+    return format_receipt_number(next_number, prefix, digits)
+
+
+def receipt_number_expression(series_key: Optional[str] = None):
+    """
+    SQL expression that allocates and formats the next receipt number,
+    for use directly in an INSERT so no separate round trip is needed.
+    Evaluates to NULL if series_key does not exist.
+    """
+    if series_key is None:
+        allocated = select(
+            literal(settings.receipt_prefix).label("prefix"),
+            literal(settings.receipt_number_digits).label("digits"),
+            receipt_number_seq.next_value().label("n"),
+        ).subquery("allocated")
+    else:
+        allocated = select(
+            ReceiptSeries.prefix.label("prefix"),
+            ReceiptSeries.number_digits.label("digits"),
+            func.nextval(cast(ReceiptSeries.sequence_name, REGCLASS)).label("n"),
+        ).where(ReceiptSeries.key == series_key).subquery("allocated")
+
+    # nextval() is volatile, so PostgreSQL evaluates the subquery exactly once
+    number = cast(allocated.c.n, Text)
+    formatted = allocated.c.prefix + "-" + func.lpad(
+        number, func.greatest(allocated.c.digits, func.length(number)), "0"
+    )
+    return select(formatted).scalar_subquery()
+
+
+async def reserve_receipt_numbers(
+    session: AsyncSession,
+    count: int,
+    series_key: Optional[str] = None
+) -> List[str]:
+    """
+    Allocate a block of receipt numbers in a single statement
+    (nextval() evaluated once per generate_series row), in ascending order.
+    """
+    numbers = func.generate_series(1, count).table_valued("n")
+
+    if series_key is None:
+        stmt = select(receipt_number_seq.next_value()).select_from(numbers)
+        values = sorted((await session.scalars(stmt)).all())
+        return [format_receipt_number(value) for value in values]
+
+    stmt = (
+        select(
+            ReceiptSeries.prefix,
+            ReceiptSeries.number_digits,
+            func.nextval(cast(ReceiptSeries.sequence_name, REGCLASS)),
+        )
+        .join(numbers, true())
+        .where(ReceiptSeries.key == series_key)
+    )
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        raise ValueError(f"Receipt series '{series_key}' not found")
+
+    return [
+        format_receipt_number(value, prefix, digits)
+        for prefix, digits, value in sorted(rows, key=lambda row: row[2])
+    ]
 
-    if last_receipt_number is None:
-        # First receipt
-        next_number = 1
+
+async def peek_next_receipt_number(
+    session: AsyncSession,
+    series_key: Optional[str] = None
+) -> str:
+    """
+    Return the receipt number the next create will most likely receive,
+    without consuming a value from the sequence (preview only).
+    """
+    if series_key is None:
+        prefix, digits, sequence_name = None, None, DEFAULT_SEQUENCE_NAME
     else:
-        # Extract number from "RECIBO-00000001" -> 1
-        number_part = last_receipt_number.split('-')[-1]
-        next_number = int(number_part) + 1
+        series = await get_series(session, series_key)
+        prefix, digits, sequence_name = series.prefix, series.number_digits, series.sequence_name
+
+    next_number = await session.scalar(text(f"SELECT {_next_value_sql(sequence_name)}"))
+    return format_receipt_number(next_number, prefix, digits)
+
+
+async def sync_receipt_number_sequence(session: AsyncSession) -> None:
+    """
+    Move every series sequence past the highest number stored in receipts
+    with that series prefix.
+    Needed after inserting receipts with explicit numbers (backup import).
+    Sequences never move backwards.
+    """
+    result = await session.execute(select(ReceiptSeries.prefix, ReceiptSeries.sequence_name))
+    series_list = [(settings.receipt_prefix, DEFAULT_SEQUENCE_NAME)] + list(result.all())
+
+    for prefix, sequence_name in series_list:
+        stmt = text(rf"""
+            SELECT setval(
+                '"{sequence_name}"',
+                GREATEST(
+                    {_next_value_sql(sequence_name)},
+                    (SELECT COALESCE(MAX(substring(receipt_number FROM '(\d+)$')::bigint), 0) + 1
+                     FROM receipts
+                     WHERE receipt_number LIKE :prefix)
+                ),
+                false
+            )
+        """)
+        await session.execute(stmt, {"prefix": f"{prefix}-%"})
+
 
-    # Format with leading zeros
-    receipt_number = f"{settings.receipt_prefix}-{next_number:0{settings.receipt_number_digits}d}"
+# Scale of the item and receipt amount columns (Numeric(_, 2))
+CENTS = Decimal("0.01")
 
-    return receipt_number
+
+def _to_cents(value: Decimal) -> Decimal:
+    """Round an amount the way PostgreSQL stores it in a Numeric(_, 2) column"""
+    return value.quantize(CENTS, rounding=ROUND_HALF_UP)
 
 
 def calculate_item_total(quantity: Decimal, unit_price: Decimal) -> Decimal:
-    """Calculate total for a receipt item"""
-    return quantity * unit_price
+    """Calculate total for a receipt item, rounded to cents"""
+    return _to_cents(quantity * unit_price)
 
 
 def calculate_receipt_totals(items: List[ReceiptItem]) -> tuple[Decimal, Decimal]:
@@ -46,116 +211,331 @@ def calculate_receipt_totals(items: List[ReceiptItem]) -> tuple[Decimal, Decimal
     return subtotal, total
 
 
+def _item_values(items: List[ReceiptItemCreate]) -> List[dict]:
+    """
+    Column values for new receipt item rows (receipt_id is filled in by the caller)
+    Amounts are rounded to the column scale, so they compare equal to the
+    stored values when items are reconciled
+    """
+    rows = []
+    for idx, item_data in enumerate(items):
+        quantity = _to_cents(item_data.quantity)
+        unit_price = _to_cents(item_data.unit_price)
+        rows.append({
+            "description": item_data.description,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total": calculate_item_total(quantity, unit_price),
+            "line_order": idx,
+        })
+    return rows
+
+
+def _receipt_values(
+    receipt_data: ReceiptCreate,
+    receipt_number: Any,
+    item_rows: List[dict],
+    signature_hash: Optional[str] = None
+) -> dict:
+    """
+    Column values for a new receipt row, with totals computed from its item rows
+    receipt_number is either a string or a SQL expression (see receipt_number_expression)
+    """
+    subtotal = sum((row["total"] for row in item_rows), Decimal("0"))
+    values = {
+        "receipt_number": receipt_number,
+        "customer_name": receipt_data.customer_name,
+        "customer_nit": receipt_data.customer_nit,
+        "customer_phone": receipt_data.customer_phone,
+        "customer_email": receipt_data.customer_email,
+        "customer_address": receipt_data.customer_address,
+        "status": receipt_data.status or ReceiptStatus.COMPLETED,
+        "notes": receipt_data.notes,
+        "signature_hash": signature_hash,
+        "received_by_name": receipt_data.received_by_name,
+        "institution": receipt_data.institution,
+        "concept": receipt_data.concept,
+        "payment_method": receipt_data.payment_method,
+        "check_number": receipt_data.check_number,
+        "bank_account": receipt_data.bank_account,
+        "custom_fields": receipt_data.custom_fields,
+        "subtotal": subtotal,
+        "total": subtotal,  # For now, total equals subtotal
+    }
+    # Leave date out when not given so the server default (CURRENT_DATE) applies
+    if receipt_data.date is not None:
+        values["date"] = receipt_data.date
+    return values
+
+
 async def create_receipt(session: AsyncSession, receipt_data: ReceiptCreate) -> Receipt:
     """
     Create a new receipt with items
+    Costs a constant number of statements regardless of the item count:
+    one INSERT ... RETURNING for the receipt (the number is allocated inside
+    it), one multi-row INSERT ... RETURNING for the items and the COMMIT,
+    plus one INSERT into the signature store when a signature is sent.
     """
-    # Generate receipt number
-    receipt_number = await generate_receipt_number(session)
-
-    # Create receipt instance
-    receipt = Receipt(
-        receipt_number=receipt_number,
-        customer_name=receipt_data.customer_name,
-        customer_nit=receipt_data.customer_nit,
-        customer_phone=receipt_data.customer_phone,
-        customer_email=receipt_data.customer_email,
-        customer_address=receipt_data.customer_address,
-        date=receipt_data.date,
-        status=receipt_data.status or ReceiptStatus.COMPLETED,
-        notes=receipt_data.notes,
-        signature=receipt_data.signature,
-        received_by_name=receipt_data.received_by_name,
-        institution=receipt_data.institution,
-        concept=receipt_data.concept,
-        payment_method=receipt_data.payment_method,
-        check_number=receipt_data.check_number,
-        bank_account=receipt_data.bank_account,
-        custom_fields=receipt_data.custom_fields,
+    # Signature image goes to the content-addressed store (raises ValueError if invalid)
+    signature = await store_signature(session, receipt_data.signature)
+
+    item_rows = _item_values(receipt_data.items)
+    values = _receipt_values(
+        receipt_data,
+        receipt_number_expression(receipt_data.series),
+        item_rows,
+        signature.hash if signature else None,
     )
 
-    # Add receipt to session
-    session.add(receipt)
-    await session.flush()  # Get receipt.id
-
-    # Create receipt items
-    items = []
-    for idx, item_data in enumerate(receipt_data.items):
-        item_total = calculate_item_total(item_data.quantity, item_data.unit_price)
-        item = ReceiptItem(
-            receipt_id=receipt.id,
-            description=item_data.description,
-            quantity=item_data.quantity,
-            unit_price=item_data.unit_price,
-            total=item_total,
-            line_order=idx,
+    try:
+        # Server-generated columns (id, created_at, ...) come back via RETURNING;
+        # items are attached below, so skip the relationship loader
+        stmt = (
+            insert(Receipt)
+            .values(**values)
+            .returning(Receipt)
+            .options(noload(Receipt.items))
         )
-        items.append(item)
-        session.add(item)
+        result = await session.scalars(stmt)
+        receipt = result.one()
+
+        for row in item_rows:
+            row["receipt_id"] = receipt.id
+        stmt = insert(ReceiptItem).returning(ReceiptItem, sort_by_parameter_order=True)
+        items = list((await session.scalars(stmt, item_rows)).all())
+    except IntegrityError as e:
+        await session.rollback()
+        # An unknown series key leaves receipt_number NULL
+        if receipt_data.series is not None and "receipt_number" in str(e.orig):
+            raise ValueError(f"Receipt series '{receipt_data.series}' not found")
+        raise
 
-    # Calculate and set receipt totals
-    subtotal, total = calculate_receipt_totals(items)
-    receipt.subtotal = subtotal
-    receipt.total = total
+    # Attach the inserted items and signature without triggering a reload
+    set_committed_value(receipt, "items", items)
+    set_committed_value(receipt, "signature_blob", signature)
 
     # Commit transaction
     await session.commit()
-    await session.refresh(receipt)
 
     return receipt
 
 
-async def get_receipt(session: AsyncSession, receipt_id: int) -> Optional[Receipt]:
+async def _insert_batch_rows(
+    session: AsyncSession,
+    pending: List[int],
+    signatures: dict,
+    receipt_rows: dict,
+    item_rows: dict
+) -> dict:
+    """
+    Write the signatures, receipts and items of the pending entries with
+    set-based statements; returns the new receipt id per entry index
+    """
+    await save_signatures(session, [signatures[idx] for idx in pending if idx in signatures])
+
+    stmt = insert(Receipt).returning(Receipt.id, Receipt.receipt_number)
+    result = await session.execute(stmt, [receipt_rows[idx] for idx in pending])
+    ids_by_number = {number: receipt_id for receipt_id, number in result.all()}
+
+    ids = {}
+    all_items = []
+    for idx in pending:
+        ids[idx] = ids_by_number[receipt_rows[idx]["receipt_number"]]
+        for row in item_rows[idx]:
+            row["receipt_id"] = ids[idx]
+        all_items.extend(item_rows[idx])
+    await session.execute(insert(ReceiptItem), all_items)
+    return ids
+
+
+async def create_receipts_batch(
+    session: AsyncSession,
+    receipts_data: List[ReceiptCreate]
+) -> List[dict]:
+    """
+    Create many receipts in a single transaction using set-based statements:
+    one number reservation per series, one executemany INSERT for the
+    signatures, one multi-row INSERT ... RETURNING for the receipts and one
+    executemany INSERT for all items.
+
+    Signatures are checked before numbers are reserved, so an entry with an
+    invalid image does not consume a number. If the set-based write fails
+    (e.g. a constraint violated by one entry), the entries are written again
+    one savepoint each, so only the offending entries fail (their reserved
+    numbers stay unused).
+
+    Returns one result dict per entry (same order as receipts_data) with
+    receipt_id, receipt_number and error (None on success).
+    """
+    results: List[Optional[dict]] = [None] * len(receipts_data)
+
+    def fail(idx: int, error: Any) -> None:
+        results[idx] = {"receipt_id": None, "receipt_number": None, "error": str(error)}
+
+    # Normalize signatures in the process pool; an invalid image only fails its own entry
+    with_signature = [idx for idx, receipt_data in enumerate(receipts_data) if receipt_data.signature]
+    prepared = await asyncio.gather(
+        *(prepare_signature(receipts_data[idx].signature) for idx in with_signature),
+        return_exceptions=True,
+    )
+    signatures: dict = {}
+    for idx, outcome in zip(with_signature, prepared):
+        if isinstance(outcome, ValueError):
+            fail(idx, outcome)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            signatures[idx] = outcome
+
+    # Reserve a block of numbers per series for the entries still valid
+    groups: dict = {}
+    for idx, receipt_data in enumerate(receipts_data):
+        if results[idx] is None:
+            groups.setdefault(receipt_data.series, []).append(idx)
+
+    numbers: dict = {}
+    for series_key, indexes in groups.items():
+        try:
+            reserved = await reserve_receipt_numbers(session, len(indexes), series_key)
+        except ValueError as e:
+            for idx in indexes:
+                fail(idx, e)
+            continue
+        numbers.update(zip(indexes, reserved))
+
+    pending = sorted(numbers)
+    item_rows = {idx: _item_values(receipts_data[idx].items) for idx in pending}
+    receipt_rows = {
+        idx: _receipt_values(
+            receipts_data[idx],
+            numbers[idx],
+            item_rows[idx],
+            signatures[idx].hash if idx in signatures else None,
+        )
+        for idx in pending
+    }
+
+    ids: dict = {}
+    if pending:
+        try:
+            async with session.begin_nested():
+                ids = await _insert_batch_rows(session, pending, signatures, receipt_rows, item_rows)
+        except SQLAlchemyError:
+            for idx in pending:
+                try:
+                    async with session.begin_nested():
+                        ids.update(await _insert_batch_rows(session, [idx], signatures, receipt_rows, item_rows))
+                except SQLAlchemyError as e:
+                    fail(idx, e.orig if getattr(e, "orig", None) is not None else e)
+
+    await session.commit()
+
+    for idx, receipt_id in ids.items():
+        results[idx] = {"receipt_id": receipt_id, "receipt_number": numbers[idx], "error": None}
+    return results
+
+
+async def get_receipt(
+    session: AsyncSession,
+    receipt_id: int,
+    include_signature: bool = True
+) -> Optional[Receipt]:
     """
     Get a receipt by ID with items
+    With include_signature=False the signature image is not loaded
+    (receipt.signature is None, signature_hash is still set)
     """
+    signature_loader = (
+        joinedload(Receipt.signature_blob) if include_signature else noload(Receipt.signature_blob)
+    )
     stmt = (
         select(Receipt)
-        .where(Receipt.id == receipt_id)
-        .options(selectinload(Receipt.items))
+        .where(Receipt.id == receipt_id, Receipt.deleted_at.is_(None))
+        .options(selectinload(Receipt.items), signature_loader)
     )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
 
+async def get_receipt_version(session: AsyncSession, receipt_id: int) -> Optional[Row]:
+    """
+    Get only the version and updated_at of a receipt (for conditional requests)
+    Returns None if not found
+    """
+    result = await session.execute(
+        select(Receipt.version, Receipt.updated_at)
+        .where(Receipt.id == receipt_id, Receipt.deleted_at.is_(None))
+    )
+    return result.one_or_none()
+
+
+async def get_receipt_signature_info(
+    session: AsyncSession,
+    receipt_id: int
+) -> Optional[tuple[Optional[str], Optional[str]]]:
+    """
+    Get (signature_hash, content_type) for a receipt without loading the image
+    Returns None if the receipt does not exist
+    """
+    stmt = (
+        select(Receipt.signature_hash, Signature.content_type)
+        .outerjoin(Signature, Signature.hash == Receipt.signature_hash)
+        .where(Receipt.id == receipt_id, Receipt.deleted_at.is_(None))
+    )
+    row = (await session.execute(stmt)).one_or_none()
+    return tuple(row) if row is not None else None
+
+
 async def get_receipt_by_number(session: AsyncSession, receipt_number: str) -> Optional[Receipt]:
     """
     Get a receipt by receipt number with items
     """
     stmt = (
         select(Receipt)
-        .where(Receipt.receipt_number == receipt_number)
-        .options(selectinload(Receipt.items))
+        .where(Receipt.receipt_number == receipt_number, Receipt.deleted_at.is_(None))
+        .options(selectinload(Receipt.items), joinedload(Receipt.signature_blob))
     )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
 
-async def list_receipts(
-    session: AsyncSession,
-    skip: int = 0,
-    limit: int = 100,
+def like_pattern(term: str) -> str:
+    """%term% pattern for ILIKE, with the term's own wildcards escaped"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# Columns returned by list_receipts (the fields of ReceiptListResponse)
+LIST_COLUMNS = (
+    Receipt.id,
+    Receipt.receipt_number,
+    Receipt.customer_name,
+    Receipt.customer_nit,
+    Receipt.date,
+    Receipt.status,
+    Receipt.total,
+    Receipt.created_at,
+)
+
+
+def apply_list_filters(
+    stmt: Select,
     search: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     status: Optional[ReceiptStatus] = None
-) -> List[Receipt]:
+) -> Select:
     """
-    List receipts with pagination, optional search, date filtering, and status
-    Search filters by receipt_number, customer_name, or customer_nit
+    Apply the receipt list filters (shared by list_receipts, count_receipt_facets,
+    the export and bulk status changes); soft-deleted receipts are always excluded
     """
-    stmt = select(Receipt)
+    stmt = stmt.where(Receipt.deleted_at.is_(None))
 
-    # Apply search filter if provided
+    # Apply search filter if provided (served by the ix_receipts_search_trgm
+    # trigram index, see receipt_search_text)
     if search:
-        search_term = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                Receipt.receipt_number.ilike(search_term),
-                Receipt.customer_name.ilike(search_term),
-                Receipt.customer_nit.ilike(search_term),
-            )
-        )
+        term = search.replace(SEARCH_TEXT_SEPARATOR, "")
+        stmt = stmt.where(receipt_search_text.ilike(like_pattern(term), escape="\\"))
 
     # Apply date filters if provided
     if date_from:
@@ -167,28 +547,400 @@ async def list_receipts(
     if status:
         stmt = stmt.where(Receipt.status == status)
 
-    # Order by created_at DESC
-    stmt = stmt.order_by(Receipt.created_at.desc())
+    return stmt
+
+
+def encode_cursor(created_at: datetime, receipt_id: int) -> str:
+    """Opaque keyset cursor for the position after (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), receipt_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Decode a cursor made by encode_cursor
+    Raises ValueError if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, receipt_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(receipt_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def list_receipts(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[ReceiptStatus] = None,
+    cursor: Optional[str] = None
+) -> List[Row]:
+    """
+    List receipts with pagination, optional search, date filtering, and status
+    Search filters by receipt_number, customer_name, or customer_nit
+    Pass the cursor of the last row (see encode_cursor) for keyset pagination;
+    it seeks through the (created_at, id) index, so deep pages cost the same
+    as the first one. skip (OFFSET) is still supported.
+    Only the columns of ReceiptListResponse are selected; items, signature,
+    notes and custom_fields are never loaded for list pages.
+    """
+    stmt = apply_list_filters(select(*LIST_COLUMNS), search, date_from, date_to, status)
+
+    # Continue after the cursor position
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(Receipt.created_at, Receipt.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    # Order by created_at DESC (id breaks ties so the order is stable)
+    stmt = stmt.order_by(Receipt.created_at.desc(), Receipt.id.desc())
 
     # Apply pagination
-    stmt = stmt.offset(skip).limit(limit)
+    if skip:
+        stmt = stmt.offset(skip)
+    stmt = stmt.limit(limit)
+
+    result = await session.execute(stmt)
+    return list(result.all())
+
+
+_facets_cache = TTLCache(maxsize=256, ttl=settings.facets_cache_ttl_seconds)
+
+
+def _facet_list(counts: dict) -> List[dict]:
+    """{value: count} -> [{"value", "count"}], largest first"""
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+
+
+def _facets_query() -> Select:
+    """Receipt count overall, by status and by payment_method (GROUPING SETS)"""
+    return select(
+        Receipt.status,
+        Receipt.payment_method,
+        func.grouping(Receipt.status, Receipt.payment_method).label("grouping"),
+        func.count().label("count"),
+    ).group_by(func.grouping_sets(tuple_(), Receipt.status, Receipt.payment_method))
+
+
+async def _count_facets(session: AsyncSession, stmt: Select) -> Tuple[int, dict, dict]:
+    """Run a _facets_query(); returns total, {status: count}, {payment_method: count}"""
+    total = 0
+    by_status: dict = {}
+    by_payment_method: dict = {}
+    for row in await session.execute(stmt):
+        # grouping() sets bit 1 when status is rolled up, bit 0 for payment_method
+        if row.grouping == 3:
+            total = row.count
+        elif row.grouping == 1:
+            by_status[row.status.value] = row.count
+        else:
+            by_payment_method[row.payment_method] = row.count
+    return total, by_status, by_payment_method
+
+
+async def _estimate_receipt_facets(session: AsyncSession) -> Optional[dict]:
+    """
+    Facets for the whole table from planner statistics (pg_class.reltuples and
+    the most-common-values lists in pg_stats), without scanning receipts
+    The statistics include soft-deleted receipts, whose counts are taken
+    exactly (through the partial index on deleted_at; the purge keeps them
+    few) and subtracted.
+    Returns None when the table is small or has not been analyzed yet
+    """
+    reltuples = await session.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'receipts'::regclass")
+    )
+    if reltuples is None or reltuples < settings.facets_estimate_min_rows:
+        return None
+
+    result = await session.execute(text("""
+        SELECT attname, null_frac,
+               most_common_vals::text::text[] AS vals, most_common_freqs AS freqs
+        FROM pg_stats
+        WHERE schemaname = current_schema()
+          AND tablename = 'receipts'
+          AND attname IN ('status', 'payment_method')
+    """))
+    stats = {row.attname: row for row in result}
+    if "status" not in stats:
+        return None
+
+    deleted_total, *deleted_counts = await _count_facets(
+        session, _facets_query().where(Receipt.deleted_at.is_not(None))
+    )
+
+    facets = {}
+    for column, deleted in zip(("status", "payment_method"), deleted_counts):
+        counts: dict = {}
+        row = stats.get(column)
+        if row is not None:
+            estimates = list(zip(row.vals or [], row.freqs or []))
+            if row.null_frac:
+                estimates.append((None, row.null_frac))
+            for value, freq in estimates:
+                if column == "status" and value is not None:
+                    value = ReceiptStatus[value].value  # stored as the enum name
+                count = round(freq * reltuples) - deleted.get(value, 0)
+                if count > 0:
+                    counts[value] = count
+        facets[column] = _facet_list(counts)
+
+    return {"total": max(reltuples - deleted_total, 0), "estimated": True, **facets}
+
+
+async def count_receipt_facets(
+    session: AsyncSession,
+    search: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[ReceiptStatus] = None,
+    exact: bool = False
+) -> dict:
+    """
+    Count receipts matching the list filters, with breakdowns by status and
+    payment_method, in one GROUPING SETS query
+    Without filters (and exact=False) large tables use planner estimates.
+    Results are cached for facets_cache_ttl_seconds per filter set.
+    """
+    cache_key = (search, date_from, date_to, status, exact)
+    cached = _facets_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    facets = None
+    if not exact and not (search or date_from or date_to or status):
+        facets = await _estimate_receipt_facets(session)
+
+    if facets is None:
+        stmt = apply_list_filters(_facets_query(), search, date_from, date_to, status)
+        total, by_status, by_payment_method = await _count_facets(session, stmt)
+        facets = {
+            "total": total,
+            "estimated": False,
+            "status": _facet_list(by_status),
+            "payment_method": _facet_list(by_payment_method),
+        }
+
+    _facets_cache.set(cache_key, facets)
+    return facets
+
+
+# Full-text search configuration (must match the receipt_search_vector function)
+SEARCH_CONFIG = literal_column("'spanish'::regconfig")
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=20, MinWords=8, MaxFragments=2, FragmentDelimiter=\" ... \""
+
+
+def prefix_tsquery(q: str) -> Optional[str]:
+    """
+    Turn free text into a to_tsquery expression where every word is a prefix
+    match ("pago colegiat" -> "pago:* & colegiat:*")
+    Returns None if the text has no searchable words
+    """
+    words = re.findall(r"[^\W_]+", q)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+async def search_receipts(
+    session: AsyncSession,
+    q: str,
+    skip: int = 0,
+    limit: int = 20
+) -> List[Row]:
+    """
+    Ranked full-text search over concept, item descriptions, institution and
+    notes (Spanish stemming, prefix matching)
+    Rows have the list columns plus rank and a highlighted snippet
+    """
+    query_text = prefix_tsquery(q)
+    if query_text is None:
+        return []
+    tsquery = func.to_tsquery(SEARCH_CONFIG, query_text)
+    rank = func.ts_rank_cd(Receipt.search_vector, tsquery)
+
+    # Rank and page through the GIN index first; snippets are built only for
+    # the returned page since ts_headline re-parses the text
+    page = (
+        select(*LIST_COLUMNS, rank.label("rank"))
+        .where(Receipt.search_vector.bool_op("@@")(tsquery), Receipt.deleted_at.is_(None))
+        .order_by(rank.desc(), Receipt.created_at.desc(), Receipt.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    items_text = (
+        select(func.string_agg(ReceiptItem.description, literal_column("' '")))
+        .where(ReceiptItem.receipt_id == page.c.id)
+        .scalar_subquery()
+    )
+    document = func.concat_ws(
+        literal_column("' '"), Receipt.concept, items_text, Receipt.institution, Receipt.notes
+    )
+    stmt = (
+        select(
+            *page.c,
+            func.ts_headline(SEARCH_CONFIG, document, tsquery, HEADLINE_OPTIONS).label("snippet"),
+        )
+        .join(Receipt, Receipt.id == page.c.id)
+        .order_by(page.c.rank.desc(), page.c.created_at.desc(), page.c.id.desc())
+    )
 
     result = await session.execute(stmt)
-    return list(result.scalars().all())
+    return list(result.all())
+
+
+# Status changes allowed by change_receipts_status (current -> targets)
+STATUS_TRANSITIONS = {
+    ReceiptStatus.DRAFT: {ReceiptStatus.COMPLETED, ReceiptStatus.PAID, ReceiptStatus.CANCELLED},
+    ReceiptStatus.COMPLETED: {ReceiptStatus.PAID, ReceiptStatus.CANCELLED},
+    ReceiptStatus.PAID: {ReceiptStatus.CANCELLED},
+    ReceiptStatus.CANCELLED: set(),
+}
+
+
+async def change_receipts_status(
+    session: AsyncSession,
+    target: ReceiptStatus,
+    ids: Optional[List[int]] = None,
+    receipt_numbers: Optional[List[str]] = None,
+    filters: Optional[dict] = None
+) -> dict:
+    """
+    Move the selected receipts (by ids, receipt_numbers or list filters) to
+    the target status with one set-based UPDATE. The allowed transitions
+    (STATUS_TRANSITIONS) are part of its WHERE clause, so receipts whose
+    current status cannot move to target are left untouched.
+    Returns updated_ids and, for ids/receipt_numbers, the skipped receipts
+    """
+    allowed_from = [status for status, targets in STATUS_TRANSITIONS.items() if target in targets]
+
+    if ids is not None:
+        selector = and_(Receipt.id.in_(ids), Receipt.deleted_at.is_(None))
+    elif receipt_numbers is not None:
+        selector = and_(Receipt.receipt_number.in_(receipt_numbers), Receipt.deleted_at.is_(None))
+    else:
+        selector = apply_list_filters(select(Receipt.id), **(filters or {})).scalar_subquery()
+        selector = Receipt.id.in_(selector)
+
+    stmt = (
+        update(Receipt)
+        .where(selector, Receipt.status.in_(allowed_from))
+        .values(status=target, version=Receipt.version + 1, updated_at=func.now())
+        .returning(Receipt.id, Receipt.receipt_number)
+        .execution_options(synchronize_session=False)
+    )
+    updated = (await session.execute(stmt)).all()
+    updated_ids = sorted(row.id for row in updated)
+
+    # Explain the explicitly named receipts that did not change
+    skipped = []
+    if ids is not None or receipt_numbers is not None:
+        result = await session.execute(
+            select(Receipt.id, Receipt.receipt_number, Receipt.status)
+            .where(selector, Receipt.id.not_in(updated_ids))
+        )
+        found = result.all()
+        for row in found:
+            reason = "already in status" if row.status == target else f"cannot change from {row.status.value}"
+            skipped.append({"id": row.id, "receipt_number": row.receipt_number, "status": row.status, "reason": reason})
+        if ids is not None:
+            missing = set(ids) - set(updated_ids) - {row.id for row in found}
+            skipped.extend({"id": receipt_id, "reason": "not found"} for receipt_id in sorted(missing))
+        else:
+            seen = {row.receipt_number for row in updated} | {row.receipt_number for row in found}
+            missing = set(receipt_numbers) - seen
+            skipped.extend({"receipt_number": number, "reason": "not found"} for number in sorted(missing))
+
+    await session.commit()
+    if updated_ids:
+        await invalidate_receipts(*updated_ids)
+
+    return {"status": target, "updated": len(updated_ids), "updated_ids": updated_ids, "skipped": skipped}
+
+
+class ReceiptVersionConflict(Exception):
+    """The receipt no longer has the version the client expected"""
+
+
+async def _reconcile_items(
+    session: AsyncSession,
+    receipt: Receipt,
+    items_data: List[ReceiptItemUpsert]
+) -> tuple[List[dict], bool]:
+    """
+    Make the receipt's items match items_data (the full new list, in order)
+    touching only the rows that differ:
+    - entries with an id update that item; entries without one reuse the
+      existing item at the same line order, if no entry claimed it by id
+    - changed items are updated, new entries inserted, and items left
+      unmatched deleted in a single statement
+    Returns the new item values in order and whether anything changed
+    Raises ValueError for ids that are not items of this receipt
+    """
+    existing = {item.id: item for item in receipt.items}
+    requested_ids = [item_data.id for item_data in items_data if item_data.id is not None]
+    unknown = [item_id for item_id in requested_ids if item_id not in existing]
+    if unknown:
+        raise ValueError(f"Items {unknown} do not belong to receipt {receipt.id}")
+    if len(set(requested_ids)) != len(requested_ids):
+        raise ValueError("Each item id may appear only once")
+
+    claimed = set(requested_ids)
+    by_line = {item.line_order: item for item in receipt.items if item.id not in claimed}
+
+    rows = _item_values(items_data)
+    updates = []
+    inserts = []
+    for row, item_data in zip(rows, items_data):
+        item = existing[item_data.id] if item_data.id is not None else by_line.pop(row["line_order"], None)
+        if item is None:
+            inserts.append({**row, "receipt_id": receipt.id})
+            continue
+        claimed.add(item.id)
+        if any(getattr(item, column) != value for column, value in row.items()):
+            updates.append({**row, "id": item.id})
+
+    removed = [item_id for item_id in existing if item_id not in claimed]
+    if removed:
+        await session.execute(
+            delete(ReceiptItem).where(ReceiptItem.id.in_(removed)),
+            execution_options={"synchronize_session": False},
+        )
+    if updates:
+        # ORM bulk UPDATE by primary key: one executemany for all changed rows
+        await session.execute(update(ReceiptItem), updates)
+    if inserts:
+        await session.execute(insert(ReceiptItem), inserts)
+
+    return rows, bool(removed or updates or inserts)
 
 
 async def update_receipt(
     session: AsyncSession,
     receipt_id: int,
-    receipt_data: ReceiptUpdate
+    receipt_data: ReceiptUpdate,
+    versions: Optional[List[int]] = None
 ) -> Optional[Receipt]:
     """
     Update a receipt and optionally its items
+    With versions, the receipt must currently have one of those versions
+    (raises ReceiptVersionConflict otherwise)
     """
     # Get existing receipt
     receipt = await get_receipt(session, receipt_id)
     if not receipt:
         return None
+    if versions is not None and receipt.version not in versions:
+        raise ReceiptVersionConflict(f"Receipt {receipt_id} was modified by another request")
 
     # Update receipt fields if provided
     if receipt_data.customer_name is not None:
@@ -208,7 +960,10 @@ async def update_receipt(
     if receipt_data.notes is not None:
         receipt.notes = receipt_data.notes
     if receipt_data.signature is not None:
-        receipt.signature = receipt_data.signature
+        # Empty string clears the signature
+        signature = await store_signature(session, receipt_data.signature)
+        receipt.signature_hash = signature.hash if signature else None
+        set_committed_value(receipt, "signature_blob", signature)
     if receipt_data.received_by_name is not None:
         receipt.received_by_name = receipt_data.received_by_name
     if receipt_data.institution is not None:
@@ -226,48 +981,126 @@ async def update_receipt(
 
     # Update items if provided
     if receipt_data.items is not None:
-        # Delete existing items
-        for item in receipt.items:
-            await session.delete(item)
-
-        # Create new items
-        items = []
-        for idx, item_data in enumerate(receipt_data.items):
-            item_total = calculate_item_total(item_data.quantity, item_data.unit_price)
-            item = ReceiptItem(
-                receipt_id=receipt.id,
-                description=item_data.description,
-                quantity=item_data.quantity,
-                unit_price=item_data.unit_price,
-                total=item_total,
-                line_order=idx,
-            )
-            items.append(item)
-            session.add(item)
+        item_rows, changed = await _reconcile_items(session, receipt, receipt_data.items)
 
         # Recalculate totals
-        await session.flush()
-        subtotal, total = calculate_receipt_totals(items)
+        subtotal = sum((row["total"] for row in item_rows), Decimal("0"))
         receipt.subtotal = subtotal
-        receipt.total = total
+        receipt.total = subtotal  # For now, total equals subtotal (see calculate_receipt_totals)
+        if changed:
+            # Items are part of the receipt's version even if the totals match
+            receipt.updated_at = func.now()
 
-    # Commit transaction
-    await session.commit()
-    await session.refresh(receipt)
+    # Commit transaction (the version_id_col check fails if another request
+    # updated the receipt since it was loaded)
+    try:
+        await session.commit()
+    except StaleDataError as e:
+        await session.rollback()
+        raise ReceiptVersionConflict(f"Receipt {receipt_id} was modified by another request") from e
+    await invalidate_receipts(receipt_id)
 
-    return receipt
+    # Reload with items (refresh would leave the lazy="raise" collection unloaded)
+    session.expire(receipt)
+    return await get_receipt(session, receipt_id)
+
+
+async def patch_receipt(
+    session: AsyncSession,
+    receipt_id: int,
+    changes: dict,
+    versions: Optional[List[int]] = None
+) -> Optional[Row]:
+    """
+    Apply merge-patch changes to a receipt's fields with one conditional
+    UPDATE ... RETURNING, without loading the receipt
+    changes maps field names to new values (None clears); custom_fields is
+    merged with jsonb_merge_patch (RFC 7396) in the database.
+    versions: the update only applies if the current version is one of them
+    (None skips the check)
+    Returns the new (version, updated_at), or None if not found
+    Raises ReceiptVersionConflict if the version does not match
+    """
+    values: dict = {}
+    for field, value in changes.items():
+        if field == "signature":
+            # Empty string or null clears the signature
+            signature = await store_signature(session, value) if value else None
+            values["signature_hash"] = signature.hash if signature else None
+        elif field == "custom_fields" and value is not None:
+            values["custom_fields"] = func.jsonb_merge_patch(Receipt.custom_fields, cast(value, JSONB))
+        else:
+            values[field] = value
+
+    conditions = [Receipt.id == receipt_id, Receipt.deleted_at.is_(None)]
+    if versions is not None:
+        conditions.append(Receipt.version.in_(versions))
+
+    if values:
+        stmt = (
+            update(Receipt)
+            .where(*conditions)
+            .values(**values, version=Receipt.version + 1, updated_at=func.now())
+            .returning(Receipt.version, Receipt.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        # Empty patch: nothing to write, only the precondition to check
+        stmt = select(Receipt.version, Receipt.updated_at).where(*conditions)
+    row = (await session.execute(stmt)).one_or_none()
+
+    if row is None:
+        await session.rollback()
+        exists = await session.scalar(
+            select(Receipt.id).where(Receipt.id == receipt_id, Receipt.deleted_at.is_(None))
+        )
+        if exists is None:
+            return None
+        raise ReceiptVersionConflict(f"Receipt {receipt_id} was modified by another request")
+
+    await session.commit()
+    if values:
+        await invalidate_receipts(receipt_id)
+    return row
 
 
 async def delete_receipt(session: AsyncSession, receipt_id: int) -> bool:
     """
-    Delete a receipt (cascade will delete items)
+    Soft-delete a receipt: it disappears from the API but keeps its rows
+    (and number) until restored or purged after receipt_retention_days
     Returns True if deleted, False if not found
     """
-    receipt = await get_receipt(session, receipt_id)
-    if not receipt:
+    stmt = (
+        update(Receipt)
+        .where(Receipt.id == receipt_id, Receipt.deleted_at.is_(None))
+        .values(deleted_at=func.now(), version=Receipt.version + 1, updated_at=func.now())
+        .returning(Receipt.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = (await session.execute(stmt)).scalar_one_or_none()
+    await session.commit()
+    if deleted is None:
         return False
 
-    await session.delete(receipt)
+    await invalidate_receipts(receipt_id)
+    return True
+
+
+async def restore_receipt(session: AsyncSession, receipt_id: int) -> Optional[Receipt]:
+    """
+    Undo a soft delete
+    Returns the restored receipt, or None if there is no deleted receipt with this ID
+    """
+    stmt = (
+        update(Receipt)
+        .where(Receipt.id == receipt_id, Receipt.deleted_at.is_not(None))
+        .values(deleted_at=None, version=Receipt.version + 1, updated_at=func.now())
+        .returning(Receipt.id)
+        .execution_options(synchronize_session=False)
+    )
+    restored = (await session.execute(stmt)).scalar_one_or_none()
     await session.commit()
+    if restored is None:
+        return None
 
-    return True
+    return await get_receipt(session, receipt_id)
@@ -0,0 +1,55 @@
+"""Receipt numbering series service."""
+from typing import List
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.series import ReceiptSeries
+from app.schemas.series import SeriesCreate
+
+
+async def list_series(session: AsyncSession) -> List[ReceiptSeries]:
+    """List all numbering series"""
+    result = await session.execute(select(ReceiptSeries).order_by(ReceiptSeries.key))
+    return list(result.scalars().all())
+
+
+async def get_series(session: AsyncSession, series_key: str) -> ReceiptSeries:
+    """
+    Get a numbering series by key
+    Raises ValueError if the series does not exist
+    """
+    result = await session.execute(
+        select(ReceiptSeries).where(ReceiptSeries.key == series_key)
+    )
+    series = result.scalar_one_or_none()
+    if series is None:
+        raise ValueError(f"Receipt series '{series_key}' not found")
+    return series
+
+
+async def create_series(session: AsyncSession, series_data: SeriesCreate) -> ReceiptSeries:
+    """
+    Create a numbering series together with its own sequence
+    """
+    # key is restricted to [a-z0-9_], so the name is a safe identifier
+    sequence_name = f"receipt_series_{series_data.key}_seq"
+
+    series = ReceiptSeries(
+        key=series_data.key,
+        name=series_data.name,
+        prefix=series_data.prefix,
+        number_digits=series_data.number_digits,
+        sequence_name=sequence_name,
+    )
+    session.add(series)
+    await session.flush()
+
+    # DDL is transactional in PostgreSQL: the sequence only exists if the row does
+    await session.execute(
+        text(f'CREATE SEQUENCE "{sequence_name}" START WITH {int(series_data.start_number)}')
+    )
+
+    await session.commit()
+    await session.refresh(series)
+
+    return series
@@ -0,0 +1,270 @@
+"""Content-addressed signature store."""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.process_pool import run_in_process
+from app.models.receipt import Receipt
+from app.models.signature import Signature
+
+DATA_URL_PATTERN = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(;[^,]*)?,(?P<data>.*)$", re.DOTALL)
+DEFAULT_CONTENT_TYPE = "image/png"
+MAX_SIGNATURE_PIXELS = 25_000_000
+SIGNATURE_CROP_MARGIN = 8  # pixels kept around the ink when cropping
+
+logger = logging.getLogger(__name__)
+
+
+def parse_signature(value: str) -> Tuple[str, bytes]:
+    """
+    Decode a signature sent by the client.
+    Accepts a data URL ("data:image/png;base64,...") or bare base64 (PNG).
+    Returns (content_type, image bytes). Raises ValueError if invalid.
+    """
+    content_type = DEFAULT_CONTENT_TYPE
+    encoded = value
+    match = DATA_URL_PATTERN.match(value)
+    if match:
+        content_type = match.group("content_type") or DEFAULT_CONTENT_TYPE
+        encoded = match.group("data")
+
+    if not content_type.startswith("image/"):
+        raise ValueError("Signature must be an image")
+
+    try:
+        data = base64.b64decode(encoded, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("Signature is not valid base64")
+    if not data:
+        raise ValueError("Signature is empty")
+
+    return content_type, data
+
+
+def signature_hash(data: bytes) -> str:
+    """Content address of a signature image (hex SHA-256)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_signature_image(
+    data: bytes,
+    max_width: int,
+    max_height: int,
+    image_format: str
+) -> Tuple[str, bytes]:
+    """
+    Validate, crop surrounding whitespace, downscale and re-encode a signature.
+    CPU-bound: runs in the process pool (see run_in_process).
+    Returns (content_type, image bytes); keeps the original bytes if
+    re-encoding would not make the image smaller.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_SIGNATURE_PIXELS:
+            raise ValueError("Signature image is too large")
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError("Signature is not a valid image")
+    original_type = Image.MIME.get(image.format, DEFAULT_CONTENT_TYPE)
+
+    image = image.convert("RGBA")
+
+    # Ink is whatever is not transparent; on opaque pads, whatever is not near-white
+    alpha = image.getchannel("A")
+    if alpha.getextrema()[0] < 255:
+        ink = alpha.point(lambda value: 255 if value > 16 else 0)
+    else:
+        ink = ImageOps.invert(image.convert("L")).point(lambda value: 255 if value > 16 else 0)
+    bbox = ink.getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        margin = SIGNATURE_CROP_MARGIN
+        image = image.crop((
+            max(left - margin, 0),
+            max(top - margin, 0),
+            min(right + margin, image.width),
+            min(bottom + margin, image.height),
+        ))
+
+    image.thumbnail((max_width, max_height), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if image_format.upper() == "WEBP":
+        image.save(output, format="WEBP", lossless=True, method=4)
+        content_type = "image/webp"
+    else:
+        image.save(output, format="PNG", optimize=True)
+        content_type = "image/png"
+    encoded = output.getvalue()
+
+    if len(encoded) >= len(data):
+        return original_type, data
+    return content_type, encoded
+
+
+def build_signature(value: str) -> Signature:
+    """Build a (transient) Signature from a client value, stored as received"""
+    content_type, data = parse_signature(value)
+    return Signature(
+        hash=signature_hash(data),
+        content_type=content_type,
+        data=data,
+        size_bytes=len(data),
+    )
+
+
+async def normalize_signature(content_type: str, data: bytes) -> Signature:
+    """
+    Run the normalization pipeline on decoded signature bytes in the
+    process pool and build a (transient) Signature from the result
+    """
+    normalized_type, normalized = await run_in_process(
+        normalize_signature_image,
+        data,
+        settings.signature_max_width,
+        settings.signature_max_height,
+        settings.signature_format,
+    )
+    return Signature(
+        hash=signature_hash(normalized),
+        content_type=normalized_type,
+        data=normalized,
+        size_bytes=len(normalized),
+        original_size_bytes=len(data),
+    )
+
+
+async def prepare_signature(value: str) -> Signature:
+    """
+    Decode and normalize a client signature value.
+    Raises ValueError if it is not a valid image.
+    """
+    content_type, data = parse_signature(value)
+    signature = await normalize_signature(content_type, data)
+    logger.info(
+        "Signature %s: %d -> %d bytes (%d saved)",
+        signature.hash[:12],
+        signature.original_size_bytes,
+        signature.size_bytes,
+        signature.original_size_bytes - signature.size_bytes,
+    )
+    return signature
+
+
+async def save_signatures(session: AsyncSession, signatures: List[Signature]) -> None:
+    """
+    Insert signatures that are not stored yet (one executemany statement).
+    Existing hashes keep their row, which deduplicates identical images, but
+    the no-op update locks it until the caller commits: the purge skips
+    locked signatures, so it cannot delete one between this insert and the
+    receipt that is about to reference it. Rows are locked in hash order so
+    concurrent batches do not deadlock.
+    """
+    rows: Dict[str, dict] = {
+        signature.hash: {
+            "hash": signature.hash,
+            "content_type": signature.content_type,
+            "data": signature.data,
+            "size_bytes": signature.size_bytes,
+            "original_size_bytes": signature.original_size_bytes,
+        }
+        for signature in sorted(signatures, key=lambda signature: signature.hash)
+    }
+    if not rows:
+        return
+    stmt = insert(Signature)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Signature.hash],
+        set_={"hash": stmt.excluded.hash},
+    )
+    await session.execute(stmt, list(rows.values()))
+
+
+async def store_signature(
+    session: AsyncSession,
+    value: Optional[str],
+    normalize: bool = True
+) -> Optional[Signature]:
+    """
+    Store a client signature value and return its Signature (None if empty).
+    With normalize=False the image is stored exactly as received (restores).
+    Does not commit; the caller's transaction covers the insert.
+    """
+    if not value:
+        return None
+    signature = await prepare_signature(value) if normalize else build_signature(value)
+    await save_signatures(session, [signature])
+    return signature
+
+
+async def get_signature(session: AsyncSession, hash: str) -> Optional[Signature]:
+    """Get a stored signature by hash"""
+    result = await session.execute(select(Signature).where(Signature.hash == hash))
+    return result.scalar_one_or_none()
+
+
+async def delete_orphaned_signatures(session: AsyncSession, hashes: List[str]) -> List[str]:
+    """
+    Delete the signatures among hashes that no receipt references any more
+    (soft-deleted receipts still count). Rows a concurrent transaction has
+    locked, e.g. by inserting a receipt that points at them, are skipped.
+    Does not commit. Returns the deleted hashes
+    """
+    if not hashes:
+        return []
+    orphans = (
+        select(Signature.hash)
+        .where(
+            Signature.hash.in_(hashes),
+            ~exists().where(Receipt.signature_hash == Signature.hash),
+        )
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        delete(Signature)
+        .where(Signature.hash.in_(orphans))
+        .returning(Signature.hash)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+
+def signature_file_path(hash: str) -> Optional[Path]:
+    """Location of a signature in the on-disk cache (None if no cache is configured)"""
+    if not settings.signature_cache_dir:
+        return None
+    return Path(settings.signature_cache_dir) / hash[:2] / hash
+
+
+def write_signature_file(path: Path, data: bytes) -> None:
+    """
+    Write a signature into the on-disk cache (blocking; run in a thread).
+    Files are content-addressed, so an existing file never needs rewriting.
+    """
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def remove_signature_files(hashes: List[str]) -> None:
+    """Remove deleted signatures from the on-disk cache (blocking; run in a thread)"""
+    for hash in hashes:
+        path = signature_file_path(hash)
+        if path is not None:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,78 @@
+"""
+Peak memory of the streaming backup export at growing table sizes.
+
+    TEST_DATABASE_URL=... pytest -m benchmark -s tests/benchmarks/test_backup_export_memory.py
+
+BENCHMARK_EXPORT_SIZES sets the receipt counts (default 100000,1000000).
+Each export runs in a fresh interpreter so its peak RSS is its own.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from app.core.database import engine
+from tests.conftest import BACKEND_DIR, TEST_DATABASE_URL, seed_receipts
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [int(size) for size in os.environ.get("BENCHMARK_EXPORT_SIZES", "100000,1000000").split(",")]
+
+# Streams the export to nowhere and reports the interpreter's peak RSS
+EXPORT_SCRIPT = """
+import asyncio, json, resource, sys
+from app.core.database import async_session_maker
+from app.services.backup_service import begin_backup_run, stream_backup
+
+async def main(fmt):
+    async with async_session_maker() as session:
+        run = await begin_backup_run(session, fmt)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    size = 0
+    async for chunk in stream_backup(run):
+        size += len(chunk)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"baseline_kb": baseline, "peak_kb": peak, "chars": size}))
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+def run_export(fmt: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", EXPORT_SCRIPT, fmt],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": TEST_DATABASE_URL, "DEBUG": "false"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+async def test_export_memory_does_not_grow_with_receipts():
+    peaks = {}
+    for count in SIZES:
+        async with engine.begin() as connection:
+            await connection.execute(text("TRUNCATE receipt_items, receipts RESTART IDENTITY CASCADE"))
+            await seed_receipts(connection, count)
+        await engine.dispose()
+
+        for fmt in ("json", "ndjson"):
+            stats = run_export(fmt)
+            peaks[count, fmt] = stats["peak_kb"]
+            print(
+                f"\n{count:>9,} receipts {fmt:>6}: peak RSS {stats['peak_kb'] / 1024:7.1f} MiB "
+                f"(after startup {stats['baseline_kb'] / 1024:6.1f} MiB), "
+                f"{stats['chars'] / 1024 / 1024:8.1f} MiB exported",
+                end="",
+            )
+    print()
+
+    smallest, largest = min(SIZES), max(SIZES)
+    for fmt in ("json", "ndjson"):
+        # 10x the receipts may not cost more than a few batches' worth of memory
+        assert peaks[largest, fmt] < peaks[smallest, fmt] * 1.25, peaks
@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) vs OFFSET pagination of the receipts list on a large table.
+
+    TEST_DATABASE_URL=... pytest -m benchmark -s tests/benchmarks/test_keyset_pagination.py
+
+BENCHMARK_ROWS sets the table size (default 1,000,000 receipts).
+"""
+import os
+import statistics
+import time
+
+import pytest
+from sqlalchemy import select, text
+
+from app.core.database import engine
+from app.models.receipt import Receipt
+from app.services.receipt_service import encode_cursor, list_receipts
+from tests.conftest import seed_receipts
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = int(os.environ.get("BENCHMARK_ROWS", 1_000_000))
+PAGE_SIZE = 100
+DEEP_PAGE = min(10_000, ROWS // PAGE_SIZE)
+RUNS = 5
+
+
+async def median_ms(session, **kwargs) -> float:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        rows = await list_receipts(session, limit=PAGE_SIZE, **kwargs)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert len(rows) == PAGE_SIZE
+    return statistics.median(timings)
+
+
+async def test_deep_cursor_page_costs_the_same_as_the_first(session):
+    async with engine.begin() as connection:
+        await seed_receipts(connection, ROWS)
+
+    # Cursor of the last row of page DEEP_PAGE - 1, i.e. what a client holds
+    # after paging that far
+    skipped = (DEEP_PAGE - 1) * PAGE_SIZE
+    last = (await session.execute(
+        select(Receipt.created_at, Receipt.id)
+        .order_by(Receipt.created_at.desc(), Receipt.id.desc())
+        .offset(skipped - 1)
+        .limit(1)
+    )).one()
+    cursor = encode_cursor(last.created_at, last.id)
+
+    await median_ms(session)  # warm the cache
+    first_page = await median_ms(session)
+    deep_cursor = await median_ms(session, cursor=cursor)
+    deep_offset = await median_ms(session, skip=skipped)
+
+    # Same rows either way
+    by_cursor = await list_receipts(session, limit=PAGE_SIZE, cursor=cursor)
+    by_offset = await list_receipts(session, limit=PAGE_SIZE, skip=skipped)
+    assert [row.id for row in by_cursor] == [row.id for row in by_offset]
+
+    plan = "\n".join((await session.execute(text(
+        "EXPLAIN SELECT id FROM receipts WHERE deleted_at IS NULL "
+        "AND (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT 100"
+    ), {"created_at": last.created_at, "id": last.id})).scalars())
+
+    print(
+        f"\n{ROWS:,} receipts, {PAGE_SIZE} per page (median of {RUNS} runs)\n"
+        f"  page 1:                 {first_page:8.2f} ms\n"
+        f"  page {DEEP_PAGE:,} by cursor:  {deep_cursor:8.2f} ms\n"
+        f"  page {DEEP_PAGE:,} by OFFSET:  {deep_offset:8.2f} ms\n"
+        f"{plan}"
+    )
+    assert "ix_receipts_created_at_id" in plan
+    # A deep cursor page seeks straight into the index; OFFSET walks every skipped row
+    assert deep_cursor < max(first_page * 5, 5.0)
+    assert deep_cursor < deep_offset
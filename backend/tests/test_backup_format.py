@@ -0,0 +1,25 @@
+"""Validation of uploaded backup archives."""
+import io
+import tarfile
+
+import pytest
+
+from app.services.backup_format import MANIFEST_NAME, BackupArchive
+
+
+def archive_with(info: tarfile.TarInfo) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:") as tar:
+        tar.addfile(info)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("member_type", [tarfile.DIRTYPE, tarfile.SYMTYPE, tarfile.CHRTYPE])
+def test_non_regular_manifest_is_rejected(member_type):
+    info = tarfile.TarInfo(MANIFEST_NAME)
+    info.type = member_type
+    info.linkname = "elsewhere.json" if member_type == tarfile.SYMTYPE else ""
+
+    with pytest.raises(ValueError, match="not a regular file"):
+        BackupArchive(archive_with(info))
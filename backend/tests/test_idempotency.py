@@ -0,0 +1,50 @@
+"""Idempotency-Key handling on POST /receipts"""
+from sqlalchemy import func, select, text
+
+from app.models.idempotency import IdempotencyKey
+from app.models.receipt import Receipt
+from tests.conftest import receipt_payload
+
+
+async def test_retry_replays_the_stored_response(client, session):
+    headers = {"Idempotency-Key": "retry-1"}
+    first = await client.post("/api/v1/receipts", json=receipt_payload(), headers=headers)
+    assert first.status_code == 201
+
+    second = await client.post("/api/v1/receipts", json=receipt_payload(), headers=headers)
+    assert second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert await session.scalar(select(func.count()).select_from(Receipt)) == 1
+
+
+async def test_key_reused_with_another_payload_is_rejected(client):
+    headers = {"Idempotency-Key": "retry-2"}
+    await client.post("/api/v1/receipts", json=receipt_payload(), headers=headers)
+    response = await client.post("/api/v1/receipts", json=receipt_payload(items=2), headers=headers)
+    assert response.status_code == 422
+
+
+async def test_failed_request_leaves_no_claim(client, session):
+    headers = {"Idempotency-Key": "retry-3"}
+    rejected = await client.post(
+        "/api/v1/receipts", json=receipt_payload(signature="not-a-data-url"), headers=headers
+    )
+    assert rejected.status_code == 400
+    assert await session.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
+
+
+async def test_unfinished_claim_is_taken_over(client, session):
+    # A claim committed without a response (left by an older version that
+    # crashed mid-request) must not block the retry until it expires
+    payload = receipt_payload()
+    await session.execute(text("""
+        INSERT INTO idempotency_keys (key, scope, request_hash, expires_at)
+        VALUES ('retry-4', 'POST /receipts', 'stale', now() + INTERVAL '1 day')
+    """))
+    await session.commit()
+
+    response = await client.post("/api/v1/receipts", json=payload, headers={"Idempotency-Key": "retry-4"})
+    assert response.status_code == 201
+    record = await session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == "retry-4"))
+    assert record.status_code == 201
@@ -0,0 +1,25 @@
+"""Facet counts, exact and estimated from planner statistics."""
+from sqlalchemy import text
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import engine
+from app.services import receipt_service
+from tests.conftest import seed_receipts
+
+
+async def test_estimated_facets_leave_out_soft_deleted_receipts(session, monkeypatch):
+    monkeypatch.setattr(settings, "facets_estimate_min_rows", 1)
+    monkeypatch.setattr(receipt_service, "_facets_cache", TTLCache(maxsize=1, ttl=0))
+    async with engine.begin() as connection:
+        await seed_receipts(connection, 1000)
+        await connection.execute(text("UPDATE receipts SET deleted_at = now() WHERE id <= 100"))
+        await connection.execute(text("ANALYZE receipts"))
+
+    estimated = await receipt_service.count_receipt_facets(session)
+    exact = await receipt_service.count_receipt_facets(session, exact=True)
+
+    assert estimated["estimated"] and not exact["estimated"]
+    assert estimated["total"] == exact["total"] == 900
+    assert estimated["status"] == exact["status"]
+    assert estimated["payment_method"] == exact["payment_method"]
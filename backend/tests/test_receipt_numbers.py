@@ -0,0 +1,59 @@
+"""Receipt number allocation under concurrent creates (receipt_number_seq)."""
+import asyncio
+
+from tests.conftest import receipt_payload
+
+CONCURRENT_CREATES = 300
+
+
+async def test_concurrent_creates_never_collide(client):
+    responses = await asyncio.gather(
+        *(client.post("/api/v1/receipts", json=receipt_payload()) for _ in range(CONCURRENT_CREATES))
+    )
+
+    assert [response.status_code for response in responses] == [201] * CONCURRENT_CREATES
+    numbers = [response.json()["receipt_number"] for response in responses]
+    assert len(set(numbers)) == CONCURRENT_CREATES
+    # No number is skipped or handed out twice
+    assert sorted(numbers) == [f"RECIBO-{n:08d}" for n in range(1, CONCURRENT_CREATES + 1)]
+
+
+async def test_concurrent_batches_and_creates_never_collide(client):
+    batch = [receipt_payload() for _ in range(25)]
+    responses = await asyncio.gather(
+        *(client.post("/api/v1/receipts/batch", json=batch) for _ in range(4)),
+        *(client.post("/api/v1/receipts", json=receipt_payload()) for _ in range(100)),
+    )
+
+    numbers = []
+    for response in responses[:4]:
+        assert response.status_code == 200, response.text
+        assert response.json()["created"] == 25
+        numbers.extend(result["receipt_number"] for result in response.json()["results"])
+    for response in responses[4:]:
+        assert response.status_code == 201, response.text
+        numbers.append(response.json()["receipt_number"])
+    assert len(numbers) == 200
+    assert len(set(numbers)) == 200
+
+
+async def test_batch_entry_with_invalid_signature_uses_no_number(client):
+    batch = [receipt_payload(signature="data:image/png;base64,bm90IGFuIGltYWdl"), receipt_payload()]
+    response = await client.post("/api/v1/receipts/batch", json=batch)
+
+    assert response.status_code == 200, response.text
+    rejected, created = response.json()["results"]
+    assert not rejected["success"]
+    assert created["receipt_number"] == "RECIBO-00000001"
+
+
+async def test_batch_entry_rejected_by_the_database_fails_alone(client):
+    overflowing = receipt_payload()
+    overflowing["items"][0]["quantity"] = "1000000000"  # beyond NUMERIC(10, 2)
+    batch = [receipt_payload(), overflowing, receipt_payload()]
+    response = await client.post("/api/v1/receipts/batch", json=batch)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 2
+    assert [result["success"] for result in response.json()["results"]] == [True, False, True]
+    assert "numeric field overflow" in response.json()["results"][1]["error"]
@@ -0,0 +1,87 @@
+"""PATCH /receipts/{id} (JSON Merge Patch with If-Match)."""
+from tests.conftest import receipt_payload
+
+MERGE_PATCH = {"Content-Type": "application/merge-patch+json"}
+
+
+async def create_receipt(client, **fields) -> tuple[dict, str]:
+    response = await client.post("/api/v1/receipts", json=receipt_payload(**fields))
+    assert response.status_code == 201, response.text
+    receipt = response.json()
+    etag = (await client.get(f"/api/v1/receipts/{receipt['id']}")).headers["ETag"]
+    return receipt, etag
+
+
+async def patch(client, receipt_id: int, body: dict, etag: str):
+    return await client.patch(
+        f"/api/v1/receipts/{receipt_id}", json=body, headers={**MERGE_PATCH, "If-Match": etag}
+    )
+
+
+async def test_patch_returns_updated_receipt_and_new_etag(client):
+    receipt, etag = await create_receipt(client)
+
+    response = await patch(client, receipt["id"], {"notes": "Entregado en oficina"}, etag)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["notes"] == "Entregado en oficina"
+    assert response.json()["customer_name"] == receipt["customer_name"]
+    assert response.headers["ETag"] == f'"{receipt["id"]}-2"'
+    # The new ETag is the one GET reports
+    current = await client.get(f"/api/v1/receipts/{receipt['id']}")
+    assert current.headers["ETag"] == response.headers["ETag"]
+    assert current.json()["notes"] == "Entregado en oficina"
+
+
+async def test_patch_merges_custom_fields(client):
+    receipt, etag = await create_receipt(client, custom_fields={"sede": "Centro", "caja": {"numero": 1, "turno": "AM"}})
+
+    response = await patch(client, receipt["id"], {"custom_fields": {"caja": {"turno": "PM"}}}, etag)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["custom_fields"] == {"sede": "Centro", "caja": {"numero": 1, "turno": "PM"}}
+
+
+async def test_patch_null_removes_field(client):
+    receipt, etag = await create_receipt(
+        client, customer_nit="1234567-8", custom_fields={"sede": "Centro", "caja": 3}
+    )
+
+    response = await patch(client, receipt["id"], {"customer_nit": None, "custom_fields": {"caja": None}}, etag)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["customer_nit"] is None
+    assert response.json()["custom_fields"] == {"sede": "Centro"}
+
+
+async def test_patch_with_stale_if_match_is_rejected(client):
+    receipt, etag = await create_receipt(client)
+    first = await patch(client, receipt["id"], {"notes": "primero"}, etag)
+    assert first.status_code == 200, first.text
+
+    response = await patch(client, receipt["id"], {"notes": "segundo"}, etag)
+
+    assert response.status_code == 412, response.text
+    current = await client.get(f"/api/v1/receipts/{receipt['id']}")
+    assert current.json()["notes"] == "primero"
+    assert current.headers["ETag"] == first.headers["ETag"]
+
+
+async def test_patch_requires_if_match(client):
+    receipt, _ = await create_receipt(client)
+
+    response = await client.patch(f"/api/v1/receipts/{receipt['id']}", json={"notes": "x"}, headers=MERGE_PATCH)
+
+    assert response.status_code == 428, response.text
+
+
+async def test_patch_rejects_immutable_fields(client):
+    receipt, etag = await create_receipt(client)
+
+    for body in ({"receipt_number": "RECIBO-99999999"}, {"items": []}, {"total": "0.00"}, {"status": None}):
+        response = await patch(client, receipt["id"], body, etag)
+        assert response.status_code == 422, (body, response.text)
+
+    current = await client.get(f"/api/v1/receipts/{receipt['id']}")
+    assert current.json()["receipt_number"] == receipt["receipt_number"]
+    assert current.headers["ETag"] == etag
@@ -0,0 +1,85 @@
+"""Statement counts of the receipt create and list paths."""
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from app.core.database import engine
+from tests.conftest import receipt_payload, seed_receipts
+
+
+def signature_data_url() -> str:
+    image = Image.new("RGBA", (200, 80), (255, 255, 255, 0))
+    for x in range(20, 180):
+        image.putpixel((x, 40), (0, 0, 0, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@pytest.mark.parametrize("items", [1, 5, 50])
+async def test_create_costs_two_statements_for_any_item_count(client, statements, items):
+    response = await client.post("/api/v1/receipts", json=receipt_payload(items=items))
+
+    assert response.status_code == 201, response.text
+    assert len(response.json()["items"]) == items
+    # INSERT receipts ... RETURNING and one multi-row INSERT receipt_items ...
+    # RETURNING; no number lookup, refresh or item reload
+    assert len(statements) == 2, statements.statements
+    assert statements.statements[0].lstrip().upper().startswith("INSERT INTO RECEIPTS")
+    assert statements.statements[1].lstrip().upper().startswith("INSERT INTO RECEIPT_ITEMS")
+
+
+async def test_create_with_signature_adds_one_statement(client, statements):
+    response = await client.post(
+        "/api/v1/receipts", json=receipt_payload(items=3, signature=signature_data_url())
+    )
+
+    assert response.status_code == 201, response.text
+    assert response.json()["signature"].startswith("data:image/")
+    assert len(statements) == 3, statements.statements
+
+
+async def test_create_returns_server_generated_columns(client):
+    response = await client.post("/api/v1/receipts", json=receipt_payload(items=2))
+
+    receipt = response.json()
+    assert receipt["id"] and receipt["created_at"] and receipt["updated_at"]
+    assert receipt["receipt_number"] == "RECIBO-00000001"
+    assert [item["line_order"] for item in receipt["items"]] == [0, 1]
+    assert all(item["id"] and item["created_at"] for item in receipt["items"])
+
+
+@pytest.mark.parametrize("limit", [10, 100])
+async def test_list_is_one_statement_per_page(client, statements, limit):
+    async with engine.begin() as connection:
+        await seed_receipts(connection, 250)
+    statements.reset()
+
+    response = await client.get("/api/v1/receipts", params={"limit": limit})
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == limit
+    assert len(statements) == 1, statements.statements
+    # Only the list columns: no items, signature join or deferred columns
+    statement = statements.statements[0]
+    assert "receipt_items" not in statement
+    assert "signatures" not in statement
+    assert "search_vector" not in statement
+
+
+async def test_list_next_page_by_cursor_is_one_statement(client, statements):
+    async with engine.begin() as connection:
+        await seed_receipts(connection, 250)
+
+    first = await client.get("/api/v1/receipts", params={"limit": 100})
+    statements.reset()
+    second = await client.get(
+        "/api/v1/receipts", params={"limit": 100, "cursor": first.headers["X-Next-Cursor"]}
+    )
+
+    assert len(statements) == 1, statements.statements
+    first_ids = {receipt["id"] for receipt in first.json()}
+    second_ids = {receipt["id"] for receipt in second.json()}
+    assert len(second_ids) == 100 and not first_ids & second_ids
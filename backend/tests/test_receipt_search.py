@@ -0,0 +1,84 @@
+"""The list search is served by the pg_trgm index (ix_receipts_search_trgm)."""
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.core.database import engine
+from app.models.receipt import Receipt
+from app.services.receipt_service import LIST_COLUMNS, apply_list_filters
+from tests.conftest import receipt_payload, seed_receipts
+
+# Large enough that a sequential scan is clearly the expensive plan
+ROWS = 50_000
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain_list_search(session, search: str) -> list:
+    """Plan nodes of the query list_receipts runs for a search term"""
+    stmt = (
+        apply_list_filters(select(*LIST_COLUMNS), search=search)
+        .order_by(Receipt.created_at.desc(), Receipt.id.desc())
+        .limit(100)
+    )
+    # Same SQL and bind parameters the app sends (asyncpg's $n placeholders)
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    connection = await session.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+    plan = await driver.fetchval(f"EXPLAIN (FORMAT JSON) {compiled.string}", *params)
+    # Decoded already if the dialect registered a json codec on the connection
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+@pytest.fixture
+async def seeded():
+    async with engine.begin() as connection:
+        await seed_receipts(connection, ROWS)
+
+
+@pytest.mark.parametrize("search", [
+    "RECIBO-00004242",  # receipt number
+    "03592398",         # NIT (of receipt 4242, see seed_receipts)
+    "cliente 4321",     # customer name, case-insensitive
+])
+async def test_search_uses_trigram_index(seeded, session, search):
+    nodes = await explain_list_search(session, search)
+
+    index_scans = [node for node in nodes if node.get("Index Name") == "ix_receipts_search_trgm"]
+    assert index_scans, nodes
+    assert not [node for node in nodes if node["Node Type"] == "Seq Scan"], nodes
+
+
+async def test_search_results(seeded, client):
+    response = await client.get("/api/v1/receipts", params={"search": "03592398"})
+
+    assert response.status_code == 200, response.text
+    assert [receipt["receipt_number"] for receipt in response.json()] == ["RECIBO-00004242"]
+
+
+async def test_search_escapes_like_wildcards(seeded, client):
+    response = await client.get("/api/v1/receipts", params={"search": "RECIBO-0000424_"})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+
+async def test_search_does_not_match_across_fields(client):
+    created = await client.post("/api/v1/receipts", json=receipt_payload(customer_nit="1234567"))
+    assert created.status_code == 201
+
+    async def search(term: str) -> list:
+        response = await client.get("/api/v1/receipts", params={"search": term})
+        return [receipt["id"] for receipt in response.json()]
+
+    assert await search("prueba 1234") == []  # end of the name, start of the NIT
+    assert await search("00000001 cliente") == []  # receipt number, then the name
+    assert await search("prueba\x1f1234") == []
+    assert await search("de prueba") == [created.json()["id"]]
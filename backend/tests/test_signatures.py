@@ -0,0 +1,52 @@
+"""Signature deduplication and its interaction with the purge."""
+from sqlalchemy import select, update
+
+from app.commands.backfill_signatures import backfill_signatures
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.receipt import Receipt
+from app.services import signature_service
+from tests.conftest import receipt_payload
+from tests.test_receipt_queries import signature_data_url
+
+
+async def test_reused_signature_is_locked_against_the_purge():
+    signature = await signature_service.prepare_signature(signature_data_url())
+    async with async_session_maker() as session:
+        await signature_service.save_signatures(session, [signature])
+        await session.commit()
+
+    # A writer reusing the (still unreferenced) hash holds it until it commits
+    async with async_session_maker() as writer, async_session_maker() as purge:
+        await signature_service.save_signatures(writer, [signature])
+        assert await signature_service.delete_orphaned_signatures(purge, [signature.hash]) == []
+        await purge.commit()
+        await writer.rollback()
+
+    async with async_session_maker() as purge:
+        assert await signature_service.delete_orphaned_signatures(purge, [signature.hash]) == [signature.hash]
+
+
+async def test_backfill_removes_the_replaced_image_from_the_file_cache(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "signature_cache_dir", str(tmp_path))
+    # Stored as received, as before normalization existed
+    old = signature_service.build_signature(signature_data_url())
+    async with async_session_maker() as session:
+        await signature_service.save_signatures(session, [old])
+        await session.commit()
+    old_path = signature_service.signature_file_path(old.hash)
+    signature_service.write_signature_file(old_path, old.data)
+    receipt = await client.post("/api/v1/receipts", json=receipt_payload())
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Receipt).where(Receipt.id == receipt.json()["id"]).values(signature_hash=old.hash)
+        )
+        await session.commit()
+
+    await backfill_signatures(batch_size=10)
+
+    assert not old_path.exists()
+    async with async_session_maker() as session:
+        new_hash = await session.scalar(select(Receipt.signature_hash).where(Receipt.id == receipt.json()["id"]))
+        assert new_hash != old.hash
+        assert await signature_service.get_signature(session, old.hash) is None